@@ -1,62 +1,272 @@
 import os
 import json
+import asyncio
+import sqlite3
 import threading
-import pandas as pd
-import plotly.express as px
-import base64
+from datetime import datetime, timedelta
+from logger import error_log
+from svg_chart import render_bar_chart
 
-# Lock file for avoid concurrency issues
-file_lock = threading.Lock()
 
+def get_analytics(analytics_file: str = "analytics.json"):
+    analytics_data = {}
 
-def get_analytics():
-    try:
-        # Acquire the lock before accessing the file
-        with file_lock:
-            analytics_file = "analytics.json"
+    if os.path.exists(analytics_file):
+        with open(analytics_file, "r") as file:
+            analytics_data = json.load(file)
 
-            analytics_data = {}
+    return analytics_data
 
+
+def today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+class AnalyticsStore:
+    """
+    SQLite store of the download counters: lifetime totals plus per-plugin daily buckets.
+
+    Methods are blocking, call them from a worker thread (e.g. `asyncio.to_thread`).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS downloads (
+            url TEXT NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (url, day)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS downloads_by_day ON downloads (day, url, count);
+        CREATE TABLE IF NOT EXISTS totals (
+            url TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path: str = "analytics.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        # Worker processes share the database: wait for their writes instead of failing
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def import_json(self, analytics_file: str):
+        """
+        One-time import of the lifetime totals of the legacy `analytics.json`.
+        """
+        with self.lock, self.connection:
+            # Take the write lock before checking, so that concurrent workers import only once
+            self.connection.execute("BEGIN IMMEDIATE")
+            if self.connection.execute("SELECT 1 FROM meta WHERE key = 'imported_json'").fetchone():
+                return
             if os.path.exists(analytics_file):
-                with open(analytics_file, "r") as file:
-                    analytics_data = json.load(file)
+                totals = get_analytics(analytics_file)
+                self.connection.executemany(
+                    "INSERT INTO totals (url, count) VALUES (?, ?) "
+                    "ON CONFLICT (url) DO UPDATE SET count = count + excluded.count",
+                    totals.items()
+                )
+                error_log(f"Imported {len(totals)} plugins analytics from {analytics_file}", "INFO")
+            self.connection.execute("INSERT INTO meta (key, value) VALUES ('imported_json', ?)", (today(),))
+
+    def totals(self) -> dict:
+        with self.lock:
+            return dict(self.connection.execute("SELECT url, count FROM totals"))
+
+    def add(self, buckets: dict):
+        """
+        Add a batch of `{(url, day): downloads}` increments in a single transaction.
+        """
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT INTO downloads (url, day, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (url, day) DO UPDATE SET count = count + excluded.count",
+                [(url, day, count) for (url, day), count in buckets.items()]
+            )
+            totals = {}
+            for (url, _), count in buckets.items():
+                totals[url] = totals.get(url, 0) + count
+            self.connection.executemany(
+                "INSERT INTO totals (url, count) VALUES (?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET count = count + excluded.count",
+                totals.items()
+            )
+
+    def top(self, since: str, limit: int) -> list:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT url, SUM(count) AS downloads FROM downloads WHERE day >= ? "
+                "GROUP BY url ORDER BY downloads DESC, url LIMIT ?",
+                (since, limit)
+            ).fetchall()
+        return [{"url": url, "downloads": downloads} for url, downloads in rows]
+
+    def series(self, url: str, since: str) -> dict:
+        with self.lock:
+            return dict(self.connection.execute(
+                "SELECT day, count FROM downloads WHERE url = ? AND day >= ?",
+                (url, since)
+            ))
+
+    def trending(self, previous_since: str, since: str, limit: int) -> list:
+        """
+        Plugins whose downloads grew the most in the window starting at `since`
+        compared to the window of the same length before it.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT url, recent, previous FROM ("
+                "  SELECT url,"
+                "    SUM(CASE WHEN day >= :since THEN count ELSE 0 END) AS recent,"
+                "    SUM(CASE WHEN day < :since THEN count ELSE 0 END) AS previous"
+                "  FROM downloads WHERE day >= :previous_since GROUP BY url"
+                ") WHERE recent > 0 "
+                "ORDER BY (recent - previous) * 1.0 / (previous + 1) DESC, recent DESC, url LIMIT :limit",
+                {"since": since, "previous_since": previous_since, "limit": limit}
+            ).fetchall()
+        return [{"url": url, "downloads": recent, "previous_downloads": previous} for url, recent, previous in rows]
+
+
+class DownloadCounter:
+    """
+    Write-behind download counters.
+
+    Downloads are counted in memory and flushed to the analytics store in batches, on a
+    timer and at shutdown. Counting never blocks the event loop on I/O. After each timed
+    flush the totals are reloaded, to include the downloads counted by other worker processes.
+    """
+
+    def __init__(self, store: AnalyticsStore, flush_interval: float = 30):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.totals = store.totals()
+        self.pending = {}
+        # Bumped at every download, identifies the current counts
+        self.version = 0
+        self.flush_lock = asyncio.Lock()
+
+    def increment(self, url: str) -> int:
+        self.totals[url] = self.totals.get(url, 0) + 1
+        self.version += 1
+        bucket = (url, today())
+        self.pending[bucket] = self.pending.get(bucket, 0) + 1
+        return self.totals[url]
 
-            return analytics_data
-    finally:
-        pass
+    def get(self, url: str) -> int:
+        return self.totals.get(url, 0)
 
+    async def flush(self):
+        async with self.flush_lock:
+            await self.flush_locked()
 
-def update_analytics(url):
-    try:
-        analytics_data = get_analytics()
+    async def flush_locked(self):
+        if not self.pending:
+            return
 
-        if url in analytics_data:
-            analytics_data[url] += 1
-        else:
-            analytics_data[url] = 1
+        # Swap the batch out on the event loop, increments keep landing in a new one while it is written
+        batch, self.pending = self.pending, {}
+        try:
+            await asyncio.to_thread(self.store.add, batch)
+        except sqlite3.Error as e:
+            for bucket, count in batch.items():
+                self.pending[bucket] = self.pending.get(bucket, 0) + count
+            error_log(f"Can't flush analytics to {self.store.path}: {str(e)}", "ERROR")
 
-        with file_lock:
-            analytics_file = "analytics.json"
-            with open(analytics_file, "w") as file:
-                json.dump(analytics_data, file, indent=4)
-    finally:
-        # Release the lock when done to allow other requests to access the file
-        if file_lock.locked():
-            file_lock.release()
+    async def sync(self) -> set:
+        """
+        Flush, then reload the totals from the store.
 
+        Returns:
+            The urls whose total changed, because other processes counted downloads.
+        """
+        async with self.flush_lock:
+            await self.flush_locked()
+            try:
+                totals = await asyncio.to_thread(self.store.totals)
+            except sqlite3.Error as e:
+                error_log(f"Can't read analytics from {self.store.path}: {str(e)}", "ERROR")
+                return set()
+
+        # Downloads counted while reading (or not flushed) are not in the store yet
+        for (url, _), count in self.pending.items():
+            totals[url] = totals.get(url, 0) + count
+        changed = {url for url, count in totals.items() if self.totals.get(url) != count}
+        if changed:
+            self.totals = totals
+            self.version += 1
+        return changed
+
+    async def flush_loop(self, on_change=None):
+        """
+        Flush and sync every `flush_interval`, calling `on_change(urls)` when totals changed.
+        """
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            changed = await self.sync()
+            if changed and on_change is not None:
+                on_change(changed)
+
+    async def top(self, days: int, limit: int) -> list:
+        await self.flush()
+        since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+        return await asyncio.to_thread(self.store.top, since, limit)
+
+    async def series(self, url: str, days: int) -> list:
+        await self.flush()
+        first_day = datetime.utcnow().date() - timedelta(days=days - 1)
+        counts = await asyncio.to_thread(self.store.series, url, first_day.isoformat())
+
+        # Days without downloads have no bucket
+        series = []
+        for offset in range(days):
+            day = (first_day + timedelta(days=offset)).isoformat()
+            series.append({"day": day, "downloads": counts.get(day, 0)})
+        return series
+
+    async def trending(self, days: int, limit: int) -> list:
+        await self.flush()
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        previous_since = since - timedelta(days=days)
+        return await asyncio.to_thread(self.store.trending, previous_since.isoformat(), since.isoformat(), limit)
+
+
+def plot_items(plugins, analytics: dict) -> list:
+    """
+    `(plugin name, downloads)` pairs of the plugins in the catalog.
+    """
+    url_to_name = {entry['url']: entry['name'] for entry in plugins}
+    return [(url_to_name[url], downloads) for url, downloads in analytics.items() if url in url_to_name]
+
+
+def generate_plot_svg(items: list) -> str:
+    return render_bar_chart(items, title="Downloads by Plugin", x_title="Number of Downloads", y_title="Plugin")
+
+
+def generate_plot_png(items: list) -> bytes:
+    """
+    Rasterize the chart with plotly and kaleido. Slow and memory hungry: run it on a worker thread.
+    """
+    # Heavy imports, only paid by the processes actually rendering a png
+    import pandas as pd
+    import plotly.express as px
 
-def generate_plot(plugins):
-    analytics = get_analytics()
     df = pd.DataFrame({
-        "plugin": list(analytics.keys()),
-        "downloads": list(analytics.values()),
+        "plugin": [name for name, _ in items],
+        "downloads": [downloads for _, downloads in items],
     })
 
     df = df.sort_values("downloads", ascending=True)
 
-    url_to_name = {entry['url']: entry['name'] for entry in plugins}
-    df["plugin"] = df["plugin"].map(url_to_name)
-
     fig = px.bar(df, y="plugin", x="downloads", orientation='h')
     fig.update_layout(
         title='<b>Downloads by Plugin</b>',
@@ -75,10 +285,4 @@ def generate_plot(plugins):
         marker_line_color='black'
     )
 
-    img_bytes = fig.to_image(format="png")
-
-    # Encode the image bytes to base64 so we can pass it as html
-    img_base64 = base64.b64encode(img_bytes).decode("utf-8")
-    html_img = f'<img src="data:image/png;base64,{img_base64}" />'
-
-    return html_img
+    return fig.to_image(format="png")
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from logger import error_log
+from contextlib import contextmanager
+from utils import atomic_write_json, file_lock, file_signature, file_sha256
+from metrics import CACHE_REQUESTS
+
+# Artifacts used this recently are never evicted, a response may still be about to open them
+EVICTION_GRACE_SECONDS = 60
+
+
+def directory_size(path: str) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def artifact_key(*parts: str) -> str:
+    return hashlib.sha256("@".join(parts).encode()).hexdigest()[:32]
+
+
+class ArtifactCache:
+    """
+    Disk cache of the plugins' zips and cloned repositories, bounded to `max_bytes`.
+
+    Zips are content-addressed by repository url + version (release tag or commit), repositories
+    by url, so plugins sharing a name can't overwrite each other. The index (url -> version,
+    content hash, size, last access) lives in memory, lookups are O(1) and updates are serialized
+    by a lock and persisted with an atomic replace. When the cache grows over budget, the least
+    recently used zips and repositories are evicted.
+
+    Several worker processes can share the cache: updates take a file lock and merge the index
+    written by the other processes before saving it.
+
+    Methods storing and looking up artifacts are blocking (a lookup may wait for the index lock
+    to merge the index of the other processes): run them on a worker thread.
+    """
+
+    def __init__(self, zip_dir: str = "zip_cache", repo_dir: str = "repository_cache", max_bytes: int = 2 * 1024 ** 3):
+        self.zip_dir = zip_dir
+        self.repo_dir = repo_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(zip_dir, "index.json")
+        self.lock_path = os.path.join(zip_dir, ".index.lock")
+        self.index_signature = None
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0}
+
+        os.makedirs(zip_dir, exist_ok=True)
+        os.makedirs(repo_dir, exist_ok=True)
+        self.index_signature = file_signature(self.index_path)
+        self.zips, self.repos = self.load()
+        self.bytes = self.count_bytes_locked()
+
+    def load(self):
+        if not os.path.exists(self.index_path):
+            return {}, {}
+
+        try:
+            with open(self.index_path, "r") as json_file:
+                data = json.load(json_file)
+            return data["zips"], data["repos"]
+        except (ValueError, KeyError, TypeError) as e:
+            error_log(f"Ignoring corrupt artifact cache index {self.index_path}: {str(e)}", "WARNING")
+            return {}, {}
+
+    @contextmanager
+    def locked(self):
+        """
+        Serialize updates with the other threads and processes, on an index merged with the one on disk.
+        """
+        with self.lock, file_lock(self.lock_path):
+            self.reload_locked()
+            yield
+
+    def reload_locked(self):
+        """
+        Merge the index saved by another process, keeping the most recent accesses seen by this one.
+        """
+        signature = file_signature(self.index_path)
+        if signature == self.index_signature:
+            return
+
+        zips, repos = self.load()
+        for entries, known in ((zips, self.zips), (repos, self.repos)):
+            for url, entry in entries.items():
+                previous = known.get(url)
+                if previous and previous.get("version") == entry.get("version"):
+                    entry["last_access"] = max(entry["last_access"], previous["last_access"])
+        self.zips, self.repos = zips, repos
+        self.bytes = self.count_bytes_locked()
+        self.index_signature = signature
+
+    def refresh(self) -> bool:
+        """
+        Pick up the artifacts stored by the other processes. Returns whether the index changed.
+        """
+        if file_signature(self.index_path) == self.index_signature:
+            return False
+        with self.locked():
+            return True
+
+    def remove_orphans(self):
+        """
+        Delete the files the index doesn't know about (e.g. name-keyed artifacts of older releases),
+        and forget the entries whose file is gone. Recent files are kept: another process may be writing them.
+        """
+        with self.locked():
+            self.remove_orphans_locked()
+            self.save_locked()
+
+    def remove_orphans_locked(self):
+        self.zips = {url: entry for url, entry in self.zips.items() if os.path.exists(self.zip_path(url, entry["version"]))}
+        self.repos = {url: entry for url, entry in self.repos.items() if os.path.isdir(self.repo_path(url))}
+
+        grace_limit = time.time() - EVICTION_GRACE_SECONDS
+        known_zips = {os.path.basename(self.zip_path(url, entry["version"])) for url, entry in self.zips.items()}
+        for name in os.listdir(self.zip_dir):
+            path = os.path.join(self.zip_dir, name)
+            if name != os.path.basename(self.index_path) and name not in known_zips and not name.startswith("."):
+                if os.path.getmtime(path) < grace_limit:
+                    self.remove_path(path)
+
+        known_repos = {os.path.basename(self.repo_path(url)) for url in self.repos}
+        for name in os.listdir(self.repo_dir):
+            path = os.path.join(self.repo_dir, name)
+            if name not in known_repos and not name.startswith(".") and os.path.getmtime(path) < grace_limit:
+                self.remove_path(path)
+
+    @staticmethod
+    def remove_path(path: str):
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            error_log(f"Can't remove cached artifact {path}: {str(e)}", "WARNING")
+
+    def zip_path(self, url: str, version: str) -> str:
+        return os.path.join(self.zip_dir, artifact_key(url, str(version)) + ".zip")
+
+    def repo_path(self, url: str) -> str:
+        return os.path.join(self.repo_dir, artifact_key(url))
+
+    def repo_lock_path(self, url: str) -> str:
+        """
+        Lock file serializing the processes cloning and zipping the repository of `url`.
+        """
+        return os.path.join(self.repo_dir, ".locks", artifact_key(url) + ".lock")
+
+    def lookup(self, url: str, version: str, count: bool = True):
+        """
+        Path of the cached zip of `url` at `version`, or None on a miss.
+
+        Re-checks made while serving the same request pass `count=False`, so that the
+        statistics count each request once.
+        """
+        entry = self.zips.get(url)
+        path = self.zip_path(url, version)
+        if (entry is None or entry["version"] != version) and self.refresh():
+            # Another process may have stored it
+            entry = self.zips.get(url)
+        if entry is None or entry["version"] != version or not os.path.exists(path):
+            if count:
+                self.count_lookup(False)
+            return None
+
+        if count:
+            self.count_lookup(True)
+        entry["last_access"] = time.time()
+        self.dirty = True
+        return path
+
+    def count_lookup(self, hit: bool):
+        self.stats["hits" if hit else "misses"] += 1
+        CACHE_REQUESTS.inc("zip", "hit" if hit else "miss")
+
+    def cached_version(self, url: str):
+        """
+        Version of the zip of `url` in the cache, if any.
+        """
+        entry = self.zips.get(url)
+        return entry["version"] if entry else None
+
+    def store_zip(self, url: str, version: str, path: str, sha256: str = None):
+        """
+        Record the zip of `url` at `version` just written at `path` (see `zip_path`), replacing older versions.
+        """
+        entry = {
+            "version": version,
+            "sha256": sha256 or file_sha256(path),
+            "size": os.path.getsize(path),
+            "last_access": time.time(),
+        }
+        with self.locked():
+            previous = self.zips.get(url)
+            if previous and previous["version"] != version:
+                self.remove_path(self.zip_path(url, previous["version"]))
+            self.zips[url] = entry
+            self.evict_locked()
+            self.save_locked()
+
+    def store_repo(self, url: str):
+        """
+        Record the repository of `url` just cloned or updated.
+        """
+        entry = {
+            "size": directory_size(self.repo_path(url)),
+            "last_access": time.time(),
+        }
+        with self.locked():
+            self.repos[url] = entry
+            self.evict_locked()
+            self.save_locked()
+
+    def total_bytes(self) -> int:
+        """
+        Size of the cached artifacts as of the last index update, safe to read while other threads update the index.
+        """
+        return self.bytes
+
+    def count_bytes_locked(self) -> int:
+        return sum(entry["size"] for entry in self.zips.values()) + sum(entry["size"] for entry in self.repos.values())
+
+    def evict_locked(self):
+        total = self.count_bytes_locked()
+        if total <= self.max_bytes:
+            return
+
+        candidates = [(entry["last_access"], "zip", url, entry) for url, entry in self.zips.items()]
+        candidates += [(entry["last_access"], "repo", url, entry) for url, entry in self.repos.items()]
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        grace_limit = time.time() - EVICTION_GRACE_SECONDS
+        for last_access, kind, url, entry in candidates:
+            if total <= self.max_bytes or last_access > grace_limit:
+                break
+            if kind == "zip":
+                self.remove_path(self.zip_path(url, entry["version"]))
+                del self.zips[url]
+            else:
+                self.remove_path(self.repo_path(url))
+                del self.repos[url]
+            total -= entry["size"]
+            self.stats["evictions"] += 1
+            self.stats["evicted_bytes"] += entry["size"]
+            error_log(f"Evicted cached {kind} of {url} ({entry['size']} bytes)", "INFO")
+
+    def save(self):
+        if self.dirty:
+            with self.locked():
+                self.save_locked()
+
+    def save_locked(self):
+        self.dirty = False
+        self.bytes = self.count_bytes_locked()
+        atomic_write_json(self.index_path, {"zips": dict(self.zips), "repos": dict(self.repos)}, indent=4)
+        self.index_signature = file_signature(self.index_path)
+
+    def statistics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            "zips": len(self.zips),
+            "repositories": len(self.repos),
+            "total_bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,48 @@
+"""
+Compare two benchmark results written by benchmarks/run.py.
+
+    $ python benchmarks/compare.py before.json after.json
+"""
+import sys
+import json
+
+# Higher is better for these fields, lower is better for the others
+HIGHER_IS_BETTER = {"throughput_rps"}
+FIELDS = ("throughput_rps", "p50_ms", "p99_ms", "cold_start_seconds", "full_seconds", "warm_start_seconds", "conditional_seconds",
+          "rss_mb", "max_rss_mb")
+
+
+def change(field: str, before, after) -> str:
+    if not before or after is None:
+        return ""
+    percent = (after - before) / before * 100
+    better = percent > 0 if field in HIGHER_IS_BETTER else percent < 0
+    return f"{percent:+.1f}% {'better' if better else 'worse'}" if abs(percent) >= 0.05 else "="
+
+
+def rows(before: dict, after: dict):
+    sections = {**{f"results.{name}": values for name, values in before["results"].items()}, "memory": before["memory"]}
+    for section, values in sections.items():
+        other = after["results"].get(section.split(".", 1)[1], {}) if section.startswith("results.") else after["memory"]
+        for field in FIELDS:
+            if field in values:
+                yield section, field, values[field], other.get(field)
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as file:
+        before = json.load(file)
+    with open(sys.argv[2]) as file:
+        after = json.load(file)
+
+    if before["config"] != after["config"]:
+        print(f"Warning: different configurations\n  {before['config']}\n  {after['config']}")
+    print(f"{'':<18}{'':<22}{before.get('commit') or 'before':>12}{after.get('commit') or 'after':>12}")
+    for section, field, old, new in rows(before, after):
+        print(f"{section:<18}{field:<22}{old:>12}{new if new is not None else '-':>12}  {change(field, old, new)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Local stand-in for the GitHub services used by the backend, for benchmarks.
+
+Serves a synthetic catalog of plugins with ETags and an optional artificial latency:
+
+- /plugins.json: the catalog index (GITHUB_PLUGINS_JSON_URL)
+- /raw/{owner}/{repo}/main/plugin.json: the manifests (GITHUB_RAW_URL = <base>/raw)
+- /api/repos/{owner}/{repo}/releases: the releases (GITHUB_API_URL = <base>/api)
+- /{owner}/{repo}/releases/download/{tag}/plugin.zip: the release assets
+- /{owner}/{repo}/info/refs, git-upload-pack: git smart HTTP through `git http-backend`
+
+Plugins with an even number have a release, the others are served as git repositories,
+all backed by the same template repository.
+
+    $ python benchmarks/fake_github.py --port 9000 --plugins 1000 --latency-ms 20
+"""
+import os
+import io
+import sys
+import random
+import asyncio
+import zipfile
+import argparse
+import subprocess
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+WORDS = ["llm", "embedding", "email", "calendar", "search", "memory", "rag", "vector", "agent", "tool", "weather",
+         "translate", "summary", "pdf", "image", "voice", "chat", "telegram", "discord", "slack", "database", "sql",
+         "python", "code", "math", "news", "music", "video", "notes", "reminder", "web", "scraper", "browser"]
+TAGS = ["ai", "tools", "email", "rag", "productivity", "fun", "dev", "data", "web", "chat", "media", "utility"]
+
+
+class FakeGitHub:
+
+    def __init__(self, base_url: str, plugins: int, latency: float, workdir: str, zip_kb: int, repo_files: int, seed: int = 42):
+        self.base_url = base_url.rstrip("/")
+        self.plugins = plugins
+        self.latency = latency
+        self.workdir = workdir
+        self.revisions = {}
+        self.catalog_revision = 0
+        self.random = random.Random(seed)
+        self.manifests = [self.make_manifest(i) for i in range(plugins)]
+        self.zip = self.make_zip(zip_kb)
+        self.git_root = os.path.join(workdir, "git")
+        self.make_template_repository(repo_files)
+
+    def plugin_url(self, i: int) -> str:
+        return f"{self.base_url}/owner-{i % 50}/plugin-{i}"
+
+    def make_manifest(self, i: int) -> dict:
+        words = self.random.sample(WORDS, 6)
+        return {
+            "name": f"{words[0].title()} {words[1].title()} {i}",
+            "version": "1.0.0",
+            "description": f"A plugin about {' '.join(words[2:])}.",
+            "author_name": f"Author {i % 97}",
+            "author_url": f"https://example.com/author-{i % 97}",
+            "plugin_url": self.plugin_url(i),
+            "tags": ", ".join(self.random.sample(TAGS, 3)),
+            "thumb": "",
+        }
+
+    @staticmethod
+    def make_zip(size_kb: int) -> bytes:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zip_file:
+            zip_file.writestr("plugin.json", "{}")
+            zip_file.writestr("payload.bin", random.Random(0).randbytes(size_kb * 1024))
+        return buffer.getvalue()
+
+    def make_template_repository(self, files: int):
+        """
+        One bare repository serves the git remotes of all the plugins.
+        """
+        bare = os.path.join(self.git_root, "template.git")
+        if os.path.exists(bare):
+            return
+        source = os.path.join(self.workdir, "template")
+        os.makedirs(source, exist_ok=True)
+        for n in range(files):
+            with open(os.path.join(source, f"module_{n}.py"), "w") as file:
+                file.write(f"def function_{n}():\n    return {n}\n" * 20)
+        with open(os.path.join(source, "plugin.json"), "w") as file:
+            file.write('{"name": "Template", "author_name": "Author"}')
+
+        git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.com", "-c", "init.defaultBranch=main"]
+        subprocess.run(git + ["init", "-q"], cwd=source, check=True)
+        subprocess.run(git + ["add", "-A"], cwd=source, check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "Template plugin"], cwd=source, check=True)
+        subprocess.run(git + ["clone", "-q", "--bare", source, bare], check=True)
+
+    async def delay(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    @staticmethod
+    def not_modified(request: Request, etag: str) -> bool:
+        return request.headers.get("if-none-match") == etag
+
+    async def index(self, request: Request):
+        await self.delay()
+        etag = f'"catalog-{self.catalog_revision}"'
+        if self.not_modified(request, etag):
+            return Response(status_code=304, headers={"etag": etag})
+        return JSONResponse([{"url": self.plugin_url(i)} for i in range(self.plugins)], headers={"etag": etag})
+
+    def plugin_number(self, request: Request) -> int:
+        i = int(request.path_params["repo"].removeprefix("plugin-").removesuffix(".git"))
+        if not 0 <= i < self.plugins:
+            raise ValueError(i)
+        return i
+
+    async def manifest(self, request: Request):
+        await self.delay()
+        try:
+            i = self.plugin_number(request)
+        except ValueError:
+            return Response(status_code=404)
+        etag = f'"manifest-{i}-{self.revisions.get(i, 0)}"'
+        if self.not_modified(request, etag):
+            return Response(status_code=304, headers={"etag": etag})
+        return JSONResponse(self.manifests[i], headers={"etag": etag, "x-ratelimit-remaining": "5000"})
+
+    async def releases(self, request: Request):
+        await self.delay()
+        try:
+            i = self.plugin_number(request)
+        except ValueError:
+            return Response(status_code=404)
+        etag = f'"releases-{i}"'
+        headers = {"etag": etag, "x-ratelimit-remaining": "5000"}
+        if self.not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        if i % 2:
+            return JSONResponse([], headers=headers)
+        asset = f"{self.plugin_url(i)}/releases/download/v1/plugin.zip"
+        return JSONResponse([{"tag_name": "v1", "assets": [{"browser_download_url": asset}]}], headers=headers)
+
+    async def asset(self, request: Request):
+        await self.delay()
+        return Response(self.zip, media_type="application/zip")
+
+    async def bump(self, request: Request):
+        """
+        Change a fraction of the manifests, so the next refresh has work to do.
+        """
+        fraction = float(request.query_params.get("fraction", 0.1))
+        self.catalog_revision += 1
+        for i in self.random.sample(range(self.plugins), int(self.plugins * fraction)):
+            self.revisions[i] = self.revisions.get(i, 0) + 1
+        return JSONResponse({"catalog_revision": self.catalog_revision})
+
+    async def git(self, request: Request):
+        """
+        Forward git smart HTTP requests to `git http-backend`, every repository is the template one.
+        """
+        await self.delay()
+        env = {
+            "PATH": os.environ.get("PATH", ""),
+            "GIT_PROJECT_ROOT": self.git_root,
+            "GIT_HTTP_EXPORT_ALL": "1",
+            "REQUEST_METHOD": request.method,
+            "PATH_INFO": "/template.git/" + request.path_params["service"],
+            "QUERY_STRING": request.url.query,
+            "CONTENT_TYPE": request.headers.get("content-type", ""),
+            "REMOTE_ADDR": "127.0.0.1",
+        }
+        if request.headers.get("content-encoding"):
+            env["HTTP_CONTENT_ENCODING"] = request.headers["content-encoding"]
+        if request.headers.get("git-protocol"):
+            env["GIT_PROTOCOL"] = request.headers["git-protocol"]
+        body = await request.body()
+        env["CONTENT_LENGTH"] = str(len(body))
+
+        process = await asyncio.create_subprocess_exec("git", "http-backend", env=env, stdin=subprocess.PIPE,
+                                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        output, _ = await process.communicate(body)
+
+        head, _, content = output.partition(b"\r\n\r\n")
+        status_code = 200
+        headers = {}
+        for line in head.decode("latin-1").split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.lower() == "status":
+                status_code = int(value.split()[0])
+            elif name:
+                headers[name] = value.strip()
+        return Response(content, status_code=status_code, headers=headers)
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/plugins.json", self.index),
+            Route("/_bump", self.bump, methods=["POST"]),
+            Route("/raw/{owner}/{repo}/main/plugin.json", self.manifest),
+            Route("/api/repos/{owner}/{repo}/releases", self.releases),
+            Route("/{owner}/{repo}/releases/download/{tag}/plugin.zip", self.asset),
+            Route("/{owner}/{repo}/{service:path}", self.git, methods=["GET", "POST"]),
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--plugins", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--zip-kb", type=int, default=256)
+    parser.add_argument("--repo-files", type=int, default=50)
+    parser.add_argument("--workdir", default="fake_github")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    fake = FakeGitHub(f"http://{args.host}:{args.port}", args.plugins, args.latency_ms / 1000, args.workdir,
+                      args.zip_kb, args.repo_files)
+    uvicorn.run(fake.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
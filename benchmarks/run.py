@@ -0,0 +1,297 @@
+"""
+Benchmark the backend against a local GitHub stand-in.
+
+Starts benchmarks/fake_github.py and the backend (uvicorn main:app) in a temporary directory,
+then measures the catalog refreshes and drives load against /plugins, /search, /tag and
+/download. Results (throughput, p50/p99 latency, memory) are printed and written as json,
+to be diffed across commits with benchmarks/compare.py.
+
+    $ python benchmarks/run.py --plugins 1000 --latency-ms 20 --duration 10 --output results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import shutil
+import tempfile
+import subprocess
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_QUERIES = ["llm", "email", "vector database", "agent tool", "web scraper", "pdf summary", "voice", "calendar reminder"]
+TAGS = ["ai", "tools", "email", "rag", "productivity", "data", "web", "media"]
+ORDERS = [None, "newest", "popular", "a2z", "z2a"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+def parse_metrics(text: str) -> dict:
+    """
+    Samples of a Prometheus text exposition, keyed by their full name with labels.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+async def wait_until_ready(client: httpx.AsyncClient, url: str, timeout: float = 300) -> float:
+    start = time.perf_counter()
+    while True:
+        try:
+            response = await client.get(url, timeout=timeout)
+            if response.status_code == 200:
+                return time.perf_counter() - start
+        except httpx.RequestError:
+            pass
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError(f"{url} not ready after {timeout}s")
+        await asyncio.sleep(0.1)
+
+
+class Benchmark:
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="plugins-backend-bench-")
+        self.fake_port = free_port()
+        self.app_port = free_port()
+        self.fake_url = f"http://127.0.0.1:{self.fake_port}"
+        self.app_url = f"http://127.0.0.1:{self.app_port}"
+        self.processes = []
+        self.app = None
+        self.random = random.Random(args.seed)
+
+    def start_fake(self):
+        command = [sys.executable, os.path.join(REPO_ROOT, "benchmarks", "fake_github.py"), "--port", str(self.fake_port),
+                   "--plugins", str(self.args.plugins), "--latency-ms", str(self.args.latency_ms),
+                   "--zip-kb", str(self.args.zip_kb), "--workdir", os.path.join(self.workdir, "fake")]
+        self.processes.append(subprocess.Popen(command))
+
+    def start_app(self):
+        app_dir = os.path.join(self.workdir, "app")
+        os.makedirs(app_dir, exist_ok=True)
+        env = dict(os.environ)
+        env.update({
+            "PYTHONPATH": REPO_ROOT,
+            "GITHUB_PLUGINS_JSON_URL": f"{self.fake_url}/plugins.json",
+            "GITHUB_RAW_URL": f"{self.fake_url}/raw",
+            "GITHUB_API_URL": f"{self.fake_url}/api",
+            "DEFAULT_PAGE_SIZE": "10",
+        })
+        env.update(self.args.env)
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.app_port),
+                   "--log-level", "warning", "--workers", str(self.args.workers)]
+        self.app = subprocess.Popen(command, cwd=app_dir, env=env)
+        self.processes.append(self.app)
+
+    def stop_app(self):
+        self.app.terminate()
+        self.app.wait(timeout=30)
+        self.processes.remove(self.app)
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait(timeout=30)
+        if self.args.keep_workdir:
+            print(f"Working directory kept in {self.workdir}")
+        else:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    async def metrics(self, client: httpx.AsyncClient) -> dict:
+        # A new connection each time, to reach any of the workers when their metrics are not shared (METRICS_DIR empty)
+        return parse_metrics((await client.get(f"{self.app_url}/metrics", headers={"Connection": "close"})).text)
+
+    async def wait_for_refresh(self, client: httpx.AsyncClient, before: dict = None) -> float:
+        """
+        Wait for the next catalog refresh of the backend (made by the leader worker) and return its duration.
+
+        The metrics of the previous runs of the backend are kept: `before` are the samples seen before it started.
+        """
+        count = 'catalog_refresh_duration_seconds_count{result="success"}'
+        total = 'catalog_refresh_duration_seconds_sum{result="success"}'
+        before = before or {}
+        while True:
+            samples = await self.metrics(client)
+            if samples.get(count, 0) > before.get(count, 0):
+                return round(samples[total] - before.get(total, 0), 3)
+            await asyncio.sleep(0.05)
+
+    async def load(self, client: httpx.AsyncClient, request) -> dict:
+        """
+        Run `request(client)` from `concurrency` workers for `duration` seconds.
+        """
+        latencies = []
+        errors = 0
+        deadline = time.perf_counter() + self.args.duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await request(client)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - start)
+
+    def plugin_url(self, i: int) -> str:
+        return f"{self.fake_url}/owner-{i % 50}/plugin-{i}"
+
+    async def scenarios(self, client: httpx.AsyncClient) -> dict:
+        pages = max(self.args.plugins // 10, 1)
+        download_pool = [self.plugin_url(i) for i in range(min(self.args.download_plugins, self.args.plugins))]
+
+        async def plugins(client):
+            return await client.get(f"{self.app_url}/plugins", params={
+                key: value for key, value in {"page": self.random.randint(1, pages), "order": self.random.choice(ORDERS)}.items() if value
+            })
+
+        async def search(client):
+            return await client.post(f"{self.app_url}/search", json={"query": self.random.choice(SEARCH_QUERIES)})
+
+        async def tag(client):
+            return await client.get(f"{self.app_url}/tag/{self.random.choice(TAGS)}")
+
+        async def download(client):
+            async with client.stream("POST", f"{self.app_url}/download", json={"url": self.random.choice(download_pool)}) as response:
+                async for _ in response.aiter_raw():
+                    pass
+            return response
+
+        results = {}
+        for name, request in (("plugins", plugins), ("search", search), ("tag", tag), ("download", download)):
+            if name in self.args.scenarios:
+                results[name] = await self.load(client, request)
+                print(f"{name:>10}: {results[name]}", flush=True)
+        return results
+
+    async def run(self) -> dict:
+        self.start_fake()
+        limits = httpx.Limits(max_connections=self.args.concurrency * 2)
+        async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+            await wait_until_ready(client, f"{self.fake_url}/plugins.json")
+
+            # Cold start: no snapshot, the whole catalog is crawled
+            self.start_app()
+            cold_start = await wait_until_ready(client, f"{self.app_url}/plugins")
+            refresh = {"cold_start_seconds": round(cold_start, 3), "full_seconds": await self.wait_for_refresh(client)}
+            print(f"   refresh: {refresh}", flush=True)
+
+            results = await self.scenarios(client)
+            memory = (await client.get(f"{self.app_url}/debug/startup")).json()
+
+            # Warm start: the snapshot is served right away and revalidated with conditional requests
+            if "refresh" in self.args.scenarios:
+                before = await self.metrics(client)
+                self.stop_app()
+                await client.post(f"{self.fake_url}/_bump", params={"fraction": self.args.changed_fraction})
+                self.start_app()
+                refresh["warm_start_seconds"] = round(await wait_until_ready(client, f"{self.app_url}/plugins"), 3)
+                refresh["conditional_seconds"] = await self.wait_for_refresh(client, before)
+                print(f"   refresh: {refresh}", flush=True)
+
+        results["refresh"] = refresh
+        return {
+            "commit": self.commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "config": {
+                "plugins": self.args.plugins,
+                "latency_ms": self.args.latency_ms,
+                "concurrency": self.args.concurrency,
+                "duration_seconds": self.args.duration,
+                "workers": self.args.workers,
+                "zip_kb": self.args.zip_kb,
+                "download_plugins": self.args.download_plugins,
+            },
+            "results": results,
+            "memory": {
+                "rss_mb": memory["current"]["rss_mb"],
+                "max_rss_mb": memory["current"]["max_rss_mb"],
+                "startup_rss_mb": memory["startup"].get("rss_mb"),
+            },
+        }
+
+    @staticmethod
+    def commit():
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--plugins", type=int, default=1000, help="Plugins in the synthetic catalog")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency added to every fake GitHub response")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--zip-kb", type=int, default=256, help="Size of the release zips")
+    parser.add_argument("--download-plugins", type=int, default=20, help="Distinct plugins downloaded")
+    parser.add_argument("--changed-fraction", type=float, default=0.1, help="Manifests changed before the warm refresh")
+    parser.add_argument("--scenarios", default="plugins,search,tag,download,refresh")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE", help="Extra backend environment")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temporary fake repositories, caches and databases")
+    parser.add_argument("--output", help="Write the results to this json file")
+    args = parser.parse_args()
+    args.scenarios = set(args.scenarios.split(","))
+    args.env = dict(item.split("=", 1) for item in args.env)
+
+    benchmark = Benchmark(args)
+    try:
+        report = asyncio.run(benchmark.run())
+    finally:
+        benchmark.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
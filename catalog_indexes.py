@@ -0,0 +1,99 @@
+def normalize_key(value: str) -> str:
+    return " ".join(str(value).split()).casefold()
+
+
+def parse_tags(tags) -> list:
+    """
+    Plugins declare tags either as a comma separated string or as a list of (comma separated) strings.
+    """
+    if isinstance(tags, str):
+        tags = [tags]
+    elif not isinstance(tags, list):
+        return []
+
+    parsed = []
+    for tag in tags:
+        parsed.extend(part.strip() for part in str(tag).split(",") if part.strip())
+    return parsed
+
+
+def build_tags_index(plugins: list) -> dict:
+    """
+    Map every normalized tag to its display name and the positions of the plugins having it.
+    """
+    index = {}
+    for position, plugin in enumerate(plugins):
+        seen = set()
+        for tag in parse_tags(plugin.get("tags")):
+            key = normalize_key(tag)
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = index.setdefault(key, {"tag": tag, "plugins": []})
+            entry["plugins"].append(position)
+    return index
+
+
+def build_authors_index(plugins: list) -> dict:
+    """
+    Map every normalized author name to the positions of their plugins.
+    """
+    index = {}
+    for position, plugin in enumerate(plugins):
+        index.setdefault(normalize_key(plugin.get("author_name", "")), []).append(position)
+    return index
+
+
+class SortOrder:
+    """
+    A precomputed permutation of the catalog positions.
+
+    `ranks` maps each position back to its place in the permutation, so resuming after
+    a known plugin costs O(1). Orders built with a `key` can move single plugins when
+    their key changes (e.g. a new download) without sorting the whole catalog again.
+    """
+
+    def __init__(self, positions: list, key=None):
+        self.positions = positions
+        self.key = key
+        self.ranks = {position: rank for rank, position in enumerate(positions)}
+
+    def reposition(self, position: int):
+        """
+        Move `position` to its sorted place after its key changed. Costs O(distance moved).
+        """
+        rank = self.ranks[position]
+        key = self.key(position)
+        while rank > 0 and self.key(self.positions[rank - 1]) > key:
+            self.swap(rank, rank - 1)
+            rank -= 1
+        while rank < len(self.positions) - 1 and self.key(self.positions[rank + 1]) < key:
+            self.swap(rank, rank + 1)
+            rank += 1
+
+    def swap(self, rank_a: int, rank_b: int):
+        positions = self.positions
+        positions[rank_a], positions[rank_b] = positions[rank_b], positions[rank_a]
+        self.ranks[positions[rank_a]] = rank_a
+        self.ranks[positions[rank_b]] = rank_b
+
+
+def build_sort_orders(plugins: list) -> dict:
+    """
+    Precompute every ordering offered by `/plugins`. Ties keep the catalog order.
+    """
+    count = len(plugins)
+
+    def name(position):
+        return plugins[position].get("name", "").lower()
+
+    def popularity(position):
+        return -plugins[position].get("downloads", 0), position
+
+    return {
+        "oldest": SortOrder(list(range(count))),
+        "newest": SortOrder(list(reversed(range(count)))),
+        "popular": SortOrder(sorted(range(count), key=popularity), key=popularity),
+        "a2z": SortOrder(sorted(range(count), key=lambda position: (name(position), position))),
+        "z2a": SortOrder(sorted(range(count), key=lambda position: (name(position), -position), reverse=True)),
+    }
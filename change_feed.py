@@ -0,0 +1,79 @@
+from bisect import bisect_right
+
+# Events kept in the feed, older revisions are dropped whole
+MAX_CHANGE_EVENTS = 10000
+
+
+def manifest_fields(plugin: dict) -> dict:
+    # Download counts move all the time, they are not catalog changes
+    return {key: value for key, value in plugin.items() if key != "downloads"}
+
+
+def catalog_changes(previous: list, plugins: list) -> list:
+    """
+    Plugins added, updated (any manifest field changed, e.g. the version) and removed between two catalogs.
+    """
+    previous_by_url = {plugin["url"]: plugin for plugin in previous}
+    urls = set()
+    changes = []
+    for plugin in plugins:
+        url = plugin["url"]
+        urls.add(url)
+        old = previous_by_url.get(url)
+        if old is None:
+            changes.append({"type": "added", "url": url, "plugin": manifest_fields(plugin)})
+            continue
+
+        fields = manifest_fields(plugin)
+        old_fields = manifest_fields(old)
+        if fields != old_fields:
+            changed_fields = sorted(key for key in fields.keys() | old_fields.keys() if fields.get(key) != old_fields.get(key))
+            changes.append({"type": "updated", "url": url, "plugin": fields, "fields": changed_fields})
+
+    for plugin in previous:
+        if plugin["url"] not in urls:
+            changes.append({"type": "removed", "url": plugin["url"], "name": plugin.get("name")})
+    return changes
+
+
+def next_feed(previous_cache: dict, plugins: list) -> dict:
+    """
+    The revision, change events and first answerable revision of a catalog following `previous_cache`.
+
+    The revision is bumped by each refresh changing the catalog. The very first catalog starts
+    the feed at revision 1 without events: mirrors sync it in full through /plugins.
+    """
+    if "plugins" not in previous_cache:
+        return {"revision": 1, "changes": [], "changes_start": 1}
+
+    revision = previous_cache.get("revision", 1)
+    changes = list(previous_cache.get("changes", []))
+    changes_start = previous_cache.get("changes_start", revision)
+
+    events = catalog_changes(previous_cache["plugins"], plugins)
+    if events:
+        revision += 1
+        changes += [{"revision": revision, **event} for event in events]
+
+    # Drop the oldest revisions whole, a client never gets part of a revision
+    start = 0
+    while len(changes) - start > MAX_CHANGE_EVENTS:
+        dropped = changes[start]["revision"]
+        while start < len(changes) and changes[start]["revision"] == dropped:
+            start += 1
+        changes_start = dropped
+    changes = changes[start:]
+    if not changes:
+        changes_start = revision
+
+    return {"revision": revision, "changes": changes, "changes_start": changes_start}
+
+
+def changes_since(cache: dict, since: int):
+    """
+    Events after revision `since`, oldest first, or None if the feed can't answer (too old, or from the future).
+    """
+    if since < cache["changes_start"] or since > cache["revision"]:
+        return None
+    changes = cache["changes"]
+    return changes[bisect_right(changes, since, key=lambda event: event["revision"]):]
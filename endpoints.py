@@ -1,28 +1,107 @@
 from urllib.parse import urlparse
-from fastapi import HTTPException, APIRouter, Body
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi import HTTPException, APIRouter, Body, Request
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse, Response
 from fastapi.openapi.utils import get_openapi
-from httpx import AsyncClient, RequestError
 from utils import *
 from typing import List, Dict, Optional
 from logger import error_log
-from analytics import update_analytics, generate_plot
+from fetcher import PluginFetcher, FetchError
+from releases import ReleaseCache
+from artifact_cache import ArtifactCache
+from tee_download import TeeDownload
+from zip_builder import ZipBuilder, DEFAULT_IGNORE
+from zip_stream import ZipStream
+from http_cache import ResponseCache
+from metrics import (REGISTRY, MetricsMiddleware, monitor_event_loop, CACHE_REQUESTS, CATALOG_REFRESH_DURATION, CATALOG_PLUGINS,
+                     CATALOG_AGE, GIT_CLONE_DURATION, ZIP_BUILD_DURATION, ARTIFACT_CACHE_BYTES)
+from snapshot import save_catalog_snapshot, load_catalog_snapshot
+from search_index import SearchIndex
+from change_feed import next_feed, changes_since
+from catalog_indexes import build_tags_index, build_authors_index, build_sort_orders, normalize_key
+from analytics import AnalyticsStore, DownloadCounter, plot_items, generate_plot_svg, generate_plot_png
 import os
-from plugins_html_table import generate_plugins_html_table, PLUGIN_COLUMNS
+import html
+import json
+import sys
+import time
+import asyncio
+from plugins_html_table import render_plugins_html_table, prerender_cells, parse_columns, normalize_classes, PLUGIN_COLUMNS
 import shutil
-import git
-import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Wait before retrying a failed scheduled refresh
+REFRESH_RETRY_SECONDS = 60
+# How often followers check for a new catalog snapshot and for a vacant leadership
+FOLLOWER_POLL_SECONDS = 5
+# How long a follower's request waits for the leader to publish the first catalog
+FOLLOWER_WAIT_SECONDS = 60
+# Modules imported lazily, reported by /debug/startup
+HEAVY_MODULES = ("git", "pandas", "plotly")
+# Tables with more rows are streamed instead of being cached whole
+TABLE_CACHE_MAX_ROWS = 500
+# Most plugins downloaded by a single bundle request
+MAX_BUNDLE_PLUGINS = 50
+# Connections of the pool streaming release zips, apart from the catalog fetches
+ASSET_DOWNLOAD_CONNECTIONS = 64
+# Longest wait for a free connection of that pool before a download fails
+ASSET_POOL_TIMEOUT_SECONDS = 120
+# Longest wait of a /changes long poll
+MAX_CHANGES_WAIT_SECONDS = 60
+# Keep-alive interval of the /changes/stream event streams
+CHANGES_KEEPALIVE_SECONDS = 15
+# Lifetime of a /changes/stream event stream, clients reconnect from the last revision they received
+CHANGES_STREAM_SECONDS = 300
+# Widest window accepted by the analytics queries
+MAX_ANALYTICS_DAYS = 3650
 
 
 class Endpoints:
 
-    def __init__(self, app, plugin_json, cache_duration, page_size):
+    def __init__(self, app, plugin_json, cache_duration, page_size, fetch_concurrency=16, fetch_timeout=10.0, fetch_retries=3,
+                 max_stale_duration=10080, snapshot_path="catalog_snapshot.json",
+                 analytics_path="analytics.json", analytics_db_path="analytics.db", analytics_flush_interval=30,
+                 git_workers=4, releases_cache_duration=10, artifacts_max_bytes=2 * 1024 ** 3,
+                 github_raw_url="https://raw.githubusercontent.com", github_api_url="https://api.github.com",
+                 leader_lock_path="leader.lock", zip_ignore=DEFAULT_IGNORE, zip_workers=2, metrics_dir="metrics"):
         self.cache_duration = cache_duration
         self.json = plugin_json
+        self.github_raw_url = github_raw_url.rstrip("/")
         self.page_size = page_size
         self.app = app
         self.cache = {}
         self.cache_timestamp = {}
+        self.refresh_stats = {}
+        self.revision_changed = asyncio.Event()
+        self.snapshot_path = snapshot_path
+        self.snapshot_signature = None
+        # Without a snapshot to share the catalog through, every worker crawls GitHub on its own
+        self.leader_lock_path = leader_lock_path if snapshot_path else None
+        self.leader_lock = None
+        self.is_leader = False
+        self.follow_task = None
+        self.max_stale_duration = max(max_stale_duration, cache_duration)
+        self.single_flight = SingleFlight()
+        self.analytics_store = AnalyticsStore(analytics_db_path)
+        self.analytics_store.import_json(analytics_path)
+        self.downloads = DownloadCounter(self.analytics_store, analytics_flush_interval)
+        self.flush_task = None
+        self.release_downloads = {}
+        self.responses = ResponseCache()
+        self.plot_png = (None, None)
+        self.startup_profile = {}
+        self.executor = ThreadPoolExecutor(max_workers=git_workers, thread_name_prefix="git")
+        self.refresh_task = None
+        self.loop_monitor_task = None
+        self.metrics_task = None
+        self.background_tasks = set()
+        self.fetcher = PluginFetcher(concurrency=fetch_concurrency, timeout=fetch_timeout, retries=fetch_retries)
+        # Zip transfers hold a connection for as long as they last, they get their own pool so they never starve the catalog and releases lookups
+        self.asset_fetcher = PluginFetcher(concurrency=ASSET_DOWNLOAD_CONNECTIONS, timeout=fetch_timeout,
+                                           pool_timeout=ASSET_POOL_TIMEOUT_SECONDS)
+        self.artifacts = ArtifactCache(max_bytes=artifacts_max_bytes)
+        self.zip_builder = ZipBuilder(ignore=zip_ignore, workers=zip_workers)
+        self.releases = ReleaseCache(self.fetcher, ttl=releases_cache_duration * 60, api_url=github_api_url,
+                                     artifacts=self.artifacts)
         # Define FastAPI endpoints
         self.router = APIRouter()
         self.router.add_api_route("/plugins", self.get_all_plugins, methods=["GET"])
@@ -32,138 +111,433 @@ class Endpoints:
         self.router.add_api_route("/exclude", self.exclude_plugins, methods=["POST"])
         self.router.add_api_route("/author", self.get_plugins_by_author, methods=["POST"])
         self.router.add_api_route("/download", self.download_plugin_zip, methods=["POST"])
+        self.router.add_api_route("/download/bundle", self.download_plugins_bundle, methods=["POST"])
         self.router.add_api_route("/search", self.search_plugins, methods=["POST"])
+        self.router.add_api_route("/changes", self.get_changes, methods=["GET"])
+        self.router.add_api_route("/changes/stream", self.get_changes_stream, methods=["GET"])
         self.router.add_api_route("/analytics", self.get_analytics, methods=["GET"])
+        self.router.add_api_route("/analytics/top", self.get_top_plugins, methods=["GET"])
+        self.router.add_api_route("/analytics/trending", self.get_trending_plugins, methods=["GET"])
+        self.router.add_api_route("/analytics/plugin", self.get_plugin_downloads, methods=["GET"])
         self.router.add_api_route("/analytics/graph", self.get_analytics_plot, methods=["GET"])
+        self.router.add_api_route("/analytics/graph.svg", self.get_analytics_plot_svg, methods=["GET"])
+        self.router.add_api_route("/analytics/graph.png", self.get_analytics_plot_png, methods=["GET"])
+        self.router.add_api_route("/debug/startup", self.get_startup_profile, methods=["GET"])
+        self.router.add_api_route("/cache/stats", self.get_cache_stats, methods=["GET"])
+        self.router.add_api_route("/metrics", self.get_metrics, methods=["GET"], include_in_schema=False)
         self.router.add_api_route("/", self.home, methods=["GET"])
         app.include_router(self.router)
+        app.add_middleware(MetricsMiddleware)
+        REGISTRY.add_collector(self.collect_metrics)
+        if metrics_dir:
+            # Worker processes publish their metrics there, a scrape of any of them reports them all
+            REGISTRY.share(metrics_dir)
 
     async def cache_plugins(self):
+        previous_manifests = self.cache.get("manifests", {})
+
         try:
-            async with AsyncClient() as client:
-                response = await client.get(self.json)
-                data = response.json()
-                analytics_data = read_analytics_data()
-
-                cached_plugins = []
-                for entry in data:
-                    url = entry["url"]
-                    plugin_json_url = url.replace("github.com", "raw.githubusercontent.com") + "/main/plugin.json"
-                    try:
-                        print(f"Fetching plugin {plugin_json_url}")
-                        plugin_data = await fetch_plugin_json(plugin_json_url)
-
-                        # Validate plugin.json required fields
-                        name = plugin_data.get("name")
-                        author_name = plugin_data.get("author_name")
-                        if name and author_name:
-                            plugin_data['url'] = url
-                            cached_plugins.append(plugin_data)
-                        else:
-                            message = f"Error: Skipping plugin {url}"
-                            error_log(message, "WARNING")
-                    except Exception as e:
-                        error_msg = f"Error fetching plugin: {plugin_json_url}, Error: {str(e)}"
-                        print(error_msg)
-                        error_log(error_msg, "ERROR")
-
-                for plugin in cached_plugins:
-                    # Use the 'url' from the item to find the corresponding analytics data
-                    downloads = analytics_data.get(plugin['url'])
-                    # If analytics data is found, add a 'downloads' key to the item with the value
-                    if downloads is not None:
-                        plugin['downloads'] = downloads
-                    else:
-                        # noinspection PyTypeChecker
-                        plugin['downloads'] = 0
-
-                # Update the cache with the new data and timestamp
-                self.cache["plugins"] = cached_plugins
-                self.cache_timestamp["plugins"] = datetime.utcnow()
-
-        except RequestError as e:
+            index, index_changed = await self.fetcher.fetch_json(self.json, self.cache.get("index"))
+        except FetchError as e:
             message = f"Error fetching data from GitHub: {str(e)}"
             error_log(f"Can't cache plugins. {message}", "ERROR")
             raise HTTPException(status_code=500, detail=message)
 
-    async def get_all_plugins(self, page: int = 1, page_size: int = 0, order: Optional[str] = None):
-        if page_size == 0:
-            page_size = self.page_size
+        analytics_data = self.downloads.totals
+
+        urls = [entry["url"] for entry in index["data"]]
+        plugin_json_urls = [self.manifest_url(url) for url in urls]
+        results, stats = await self.fetcher.fetch_all_json(plugin_json_urls, previous_manifests)
+
+        manifests = {}
+        cached_plugins = []
+        for url, plugin_json_url in zip(urls, plugin_json_urls):
+            result = results[plugin_json_url]
+            if isinstance(result, Exception):
+                error_msg = f"Error fetching plugin: {plugin_json_url}, Error: {str(result)}"
+                print(error_msg)
+                error_log(error_msg, "ERROR")
+                # Keep serving the last known manifest through transient failures, drop deleted ones
+                if getattr(result, "status_code", None) == 404 or plugin_json_url not in previous_manifests:
+                    continue
+                manifest = previous_manifests[plugin_json_url]
+            else:
+                manifest = result[0]
+
+            # Validate plugin.json required fields
+            plugin_data = manifest["data"]
+            name = plugin_data.get("name") if isinstance(plugin_data, dict) else None
+            author_name = plugin_data.get("author_name") if isinstance(plugin_data, dict) else None
+            if name and author_name:
+                manifests[plugin_json_url] = manifest
+                # Copy the manifest, the cached entry gets catalog-only fields like 'downloads'
+                cached_plugins.append({**plugin_data, "url": url})
+            else:
+                message = f"Error: Skipping plugin {url}"
+                error_log(message, "WARNING")
+
+        for plugin in cached_plugins:
+            # Use the 'url' from the item to find the corresponding analytics data
+            downloads = analytics_data.get(plugin['url'])
+            # If analytics data is found, add a 'downloads' key to the item with the value
+            if downloads is not None:
+                plugin['downloads'] = downloads
+            else:
+                # noinspection PyTypeChecker
+                plugin['downloads'] = 0
+
+        feed = next_feed(self.cache, cached_plugins)
+        self.install_catalog({"plugins": cached_plugins, "index": index, "manifests": manifests, **feed}, datetime.utcnow())
+
+        stats["index_changed"] = index_changed
+        self.refresh_stats = stats
+        error_log(f"Catalog refreshed in {stats['duration_seconds']}s: {stats['total']} plugins, "
+                  f"{stats['changed']} changed, {stats['unchanged']} unchanged, {stats['failed']} failed", "INFO")
+
+        if self.snapshot_path:
+            try:
+                await asyncio.to_thread(save_catalog_snapshot, self.snapshot_path, self.cache, self.cache_timestamp["plugins"])
+                self.snapshot_signature = file_signature(self.snapshot_path)
+            except OSError as e:
+                error_log(f"Can't write catalog snapshot {self.snapshot_path}: {str(e)}", "ERROR")
+
+    def manifest_url(self, plugin_url: str) -> str:
+        """
+        Raw url of the plugin.json on the main branch of the repository.
+        """
+        return self.github_raw_url + str(urlparse(plugin_url).path).rstrip("/") + "/main/plugin.json"
+
+    def install_catalog(self, cache: dict, cache_timestamp: datetime):
+        cache["positions_by_url"] = {plugin["url"]: position for position, plugin in enumerate(cache["plugins"])}
+        cache["sort_orders"] = build_sort_orders(cache["plugins"])
+        cache["search_index"] = SearchIndex(cache["plugins"])
+        cache["tags_index"] = build_tags_index(cache["plugins"])
+        cache["table_cells"] = prerender_cells(cache["plugins"])
+        cache["authors_index"] = build_authors_index(cache["plugins"])
+
+        # Swap in the new catalog and timestamp at once, requests never see a half-built cache
+        previous_revision = self.cache.get("revision")
+        self.cache = cache
+        self.cache_timestamp = {"plugins": cache_timestamp}
+
+        if cache["revision"] != previous_revision:
+            # Wake up the change feed clients waiting for this revision
+            self.revision_changed.set()
+            self.revision_changed = asyncio.Event()
+
+    def load_snapshot(self):
+        """
+        Serve the catalog persisted by the last refresh, if there is a usable one.
+        """
+        return self.install_snapshot(*self.read_snapshot())
+
+    async def reload_snapshot(self):
+        snapshot, signature = await asyncio.to_thread(self.read_snapshot)
+        return self.install_snapshot(snapshot, signature)
+
+    def read_snapshot(self):
+        if not self.snapshot_path:
+            return None, None
+        # Take the signature first: a snapshot replaced while it is read gets reloaded
+        signature = file_signature(self.snapshot_path)
+        return load_catalog_snapshot(self.snapshot_path), signature
+
+    def install_snapshot(self, snapshot, signature):
+        if snapshot is None:
+            return False
+
+        cache, cache_timestamp = snapshot
+        self.snapshot_signature = signature
+        # Download counts kept moving after the snapshot was written
+        analytics_data = self.downloads.totals
+        for plugin in cache["plugins"]:
+            plugin["downloads"] = analytics_data.get(plugin["url"], 0)
+
+        self.install_catalog(cache, cache_timestamp)
+        error_log(f"Loaded {len(cache['plugins'])} plugins from catalog snapshot {self.snapshot_path}", "INFO")
+        return True
+
+    async def refresh_catalog(self):
+        """
+        Rebuild the catalog. Concurrent callers share the same in-flight refresh.
+        """
+        await self.single_flight.run("catalog", self.timed_cache_plugins)
 
-        # Check if cache is still valid
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
+    async def timed_cache_plugins(self):
+        start = time.perf_counter()
+        result = "failed"
+        try:
             await self.cache_plugins()
+            result = "success"
+        finally:
+            CATALOG_REFRESH_DURATION.observe(time.perf_counter() - start, result)
 
-        # Retrieve plugins from cache
-        cached_plugins = self.cache["plugins"]
+    def schedule_refresh(self):
+        """
+        Start a background refresh unless one is already running.
+        """
+        if not self.single_flight.running("catalog"):
+            task = asyncio.create_task(self.background_refresh())
+            # Keep a reference until done, the event loop only holds weak references to tasks
+            self.background_tasks.add(task)
+            task.add_done_callback(self.background_tasks.discard)
 
-        # Create a copy for preserving the original order
-        sorted_plugins = cached_plugins[:]
+    async def background_refresh(self):
+        try:
+            await self.refresh_catalog()
+            return True
+        except Exception as e:
+            error_log(f"Background catalog refresh failed: {str(e)}", "ERROR")
+            return False
 
-        if order == 'oldest':
-            pass  # Default
-        elif order == 'newest':
-            sorted_plugins = list(reversed(sorted_plugins))
-        elif order == 'popular':
-            sorted_plugins.sort(key=lambda x: x.get('downloads', 0), reverse=True)
-        elif order == 'a2z':
-            sorted_plugins.sort(key=lambda x: x.get('name', '').lower())
-        elif order == 'z2a':
-            sorted_plugins.sort(key=lambda x: x.get('name', '').lower(), reverse=True)
+    async def ensure_cache(self):
+        """
+        Make sure there is a catalog to serve.
 
-        start_index = (page - 1) * page_size
+        A fresh catalog is served as is. An expired one keeps being served while a single
+        background task rebuilds it, unless it is older than `max_stale_duration`: in that case
+        the request waits for the refresh and fails if the catalog can't be rebuilt.
+        """
+        if not self.is_leader:
+            await self.ensure_follower_cache()
+            return
+
+        if is_cache_valid(self.cache_duration, self.cache_timestamp):
+            CACHE_REQUESTS.inc("catalog", "hit")
+            return
+
+        if is_cache_valid(self.max_stale_duration, self.cache_timestamp):
+            CACHE_REQUESTS.inc("catalog", "stale")
+            self.schedule_refresh()
+            return
+
+        CACHE_REQUESTS.inc("catalog", "miss")
+        try:
+            await self.refresh_catalog()
+        except Exception as e:
+            error_log(f"Can't serve the catalog, refresh failed and no usable cache: {str(e)}", "ERROR")
+            raise HTTPException(status_code=503, detail="Plugins catalog temporarily unavailable.")
+
+    async def ensure_follower_cache(self):
+        """
+        Followers serve the catalog published by the leader, waiting for the first one if needed.
+        """
+        if self.cache_timestamp:
+            CACHE_REQUESTS.inc("catalog", "hit")
+            return
+
+        CACHE_REQUESTS.inc("catalog", "miss")
+        if not await self.single_flight.run("snapshot", self.wait_for_snapshot):
+            raise HTTPException(status_code=503, detail="Plugins catalog temporarily unavailable.")
+
+    async def wait_for_snapshot(self):
+        deadline = time.monotonic() + FOLLOWER_WAIT_SECONDS
+        while not await self.reload_snapshot():
+            if self.is_leader or time.monotonic() > deadline:
+                return bool(self.cache_timestamp)
+            await asyncio.sleep(0.5)
+        return True
+
+    def try_lead(self) -> bool:
+        """
+        Become the leader if no other worker is: the leader refreshes the catalog and publishes it in the snapshot.
+        """
+        if self.leader_lock_path:
+            self.leader_lock = try_lock(self.leader_lock_path)
+            if self.leader_lock is None:
+                return False
+            error_log(f"Worker {os.getpid()} is the leader", "INFO")
+
+        self.is_leader = True
+        task = asyncio.create_task(self.remove_orphan_artifacts())
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        self.refresh_task = asyncio.create_task(self.refresh_loop())
+        return True
+
+    async def remove_orphan_artifacts(self):
+        try:
+            await asyncio.to_thread(self.artifacts.remove_orphans)
+        except Exception as e:
+            error_log(f"Can't remove the orphan artifacts: {str(e)}", "WARNING")
+
+    async def follow_loop(self):
+        """
+        Reload the snapshot whenever the leader publishes a new one, and take over if the leader goes away.
+        """
+        while True:
+            await asyncio.sleep(FOLLOWER_POLL_SECONDS)
+            if self.try_lead():
+                # Revalidate what the previous leader published
+                self.schedule_refresh()
+                return
+            if file_signature(self.snapshot_path) != self.snapshot_signature:
+                try:
+                    await self.reload_snapshot()
+                except Exception as e:
+                    error_log(f"Can't reload catalog snapshot {self.snapshot_path}: {str(e)}", "ERROR")
+
+    async def refresh_loop(self):
+        """
+        Keep the catalog warm: refresh it whenever it expires, retrying sooner after a failure.
+        """
+        while True:
+            if not is_cache_valid(self.cache_duration, self.cache_timestamp):
+                if not await self.background_refresh():
+                    await asyncio.sleep(REFRESH_RETRY_SECONDS)
+                    continue
+
+            expires_at = self.cache_timestamp["plugins"] + timedelta(minutes=self.cache_duration)
+            await asyncio.sleep(max((expires_at - datetime.utcnow()).total_seconds(), 1))
+
+    def cached_response(self, request: Request, variant, build, media_type: str = "application/json", live_counts: bool = True):
+        """
+        Serve `build()` with validators and compression, reusing the serialized body while the catalog doesn't change.
+
+        Bodies showing download counts (`live_counts`) also change with every download: clients must
+        revalidate them. The others may be cached by clients until the next scheduled refresh.
+        """
+        version, max_age = self.response_version(live_counts)
+        return self.responses.respond(request, version, variant, build, media_type,
+                                      last_modified=self.cache_timestamp["plugins"], max_age=max_age)
+
+    def streamed_response(self, request: Request, variant, chunks, media_type: str = "application/json", live_counts: bool = True):
+        """
+        Like `cached_response`, for bodies too big to keep in memory: streamed as `chunks()` produces them.
+        """
+        version, max_age = self.response_version(live_counts)
+        return self.responses.stream(request, version, variant, chunks, media_type,
+                                     last_modified=self.cache_timestamp["plugins"], max_age=max_age)
+
+    def response_version(self, live_counts: bool):
+        """
+        Version of the catalog responses, and how long clients may keep them.
+        """
+        cache_timestamp = self.cache_timestamp["plugins"]
+        if live_counts:
+            return f"{cache_timestamp.isoformat()}-{self.downloads.version}", 0
+        expires_at = cache_timestamp + timedelta(minutes=self.cache_duration)
+        return cache_timestamp.isoformat(), (expires_at - datetime.utcnow()).total_seconds()
+
+    async def get_all_plugins(self, request: Request, page: int = 1, page_size: int = 0, order: Optional[str] = None, cursor: Optional[str] = None):
+        if page_size == 0:
+            page_size = self.page_size
+
+        await self.ensure_cache()
+
+        return self.cached_response(request, ("plugins", page, page_size, order, cursor),
+                                    lambda: self.plugins_page(page, page_size, order, cursor))
+
+    def plugins_page(self, page: int, page_size: int, order: Optional[str], cursor: Optional[str]):
+        # Orderings are precomputed with the catalog, 'oldest' is the default
+        cache = self.cache
+        if order not in cache["sort_orders"]:
+            order = "oldest"
+        sort_order = cache["sort_orders"][order]
+
+        if cursor:
+            start_index = self.resolve_cursor(cache, sort_order, order, cursor)
+        else:
+            start_index = (page - 1) * page_size
         end_index = start_index + page_size
-        paginated_plugins = sorted_plugins[start_index:end_index]
+        positions = sort_order.positions[start_index:end_index]
+        paginated_plugins = [cache["plugins"][position] for position in positions]
+
+        next_cursor = None
+        if positions and end_index < len(sort_order.positions):
+            last_plugin = paginated_plugins[-1]
+            next_cursor = encode_cursor({"order": order, "url": last_plugin["url"], "rank": end_index - 1})
 
         return {
-            "total_plugins": len(sorted_plugins),
+            "total_plugins": len(sort_order.positions),
             "page": page,
             "page_size": page_size,
             "plugins": paginated_plugins,
+            "next_cursor": next_cursor,
         }
-    
-    async def get_plugins_html_table(self, columns: Optional[str] = ",".join(PLUGIN_COLUMNS), render_link: Optional[bool] = False, classes: Optional[str] = "plugins-table"):
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
-            await self.cache_plugins()
 
-        html_img = generate_plugins_html_table(self.cache["plugins"], columns, render_link, classes)
-        return HTMLResponse(content=html_img)
-
-    async def get_all_tags(self):
-        # Check if cache is still valid, otherwise update the cache
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
-            await self.cache_plugins()
-
-        # Get all tags from plugin data
-        all_tags = set()
-        for plugin_data in self.cache["plugins"]:
-            if "tags" in plugin_data:
-                tags = plugin_data["tags"]
-                if isinstance(tags, str):
-                    all_tags.update(tags.split(","))
-                elif isinstance(tags, list):
-                    for tag in tags:
-                        all_tags.update(tag.split(","))
-
-        tags_dict = {i: tag.strip() for i, tag in enumerate(all_tags)}
+    @staticmethod
+    def resolve_cursor(cache: dict, sort_order, order: str, cursor: str) -> int:
+        """
+        Index where the page following `cursor` starts.
 
-        return tags_dict
+        The cursor remembers the last plugin served: the next page resumes right after it,
+        wherever a refresh or new downloads moved it. If it left the catalog, resume at its old rank.
+        """
+        try:
+            data = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid 'cursor'.")
+        if data.get("order") != order:
+            raise HTTPException(status_code=400, detail=f"'cursor' was issued for order '{data.get('order')}', not '{order}'.")
+        rank = data.get("rank")
+        if not isinstance(rank, int) or isinstance(rank, bool) or rank < 0 or not isinstance(data.get("url"), str):
+            raise HTTPException(status_code=400, detail="Invalid 'cursor'.")
+
+        position = cache["positions_by_url"].get(data["url"])
+        if position is not None:
+            return sort_order.ranks[position] + 1
+        return rank + 1
+
+    async def get_plugins_html_table(self, request: Request, columns: Optional[str] = ",".join(PLUGIN_COLUMNS), render_link: Optional[bool] = False,
+                                     classes: Optional[str] = "plugins-table", page: int = 1, page_size: int = 0, order: Optional[str] = None):
+        await self.ensure_cache()
+
+        columns = parse_columns(columns)
+        classes = normalize_classes(classes)
+
+        # Cells are escaped with the catalog, rows are sorted with the precomputed orderings
+        cache = self.cache
+        if order not in cache["sort_orders"]:
+            order = "oldest"
+        positions = cache["sort_orders"][order].positions
+        if page_size > 0:
+            positions = positions[(page - 1) * page_size:page * page_size]
+
+        def render():
+            return render_plugins_html_table(cache["plugins"], cache["table_cells"], positions, columns, render_link, classes)
+
+        variant = ("plugins-table", columns, render_link, classes, order, page if page_size > 0 else 1, page_size)
+        live_counts = "downloads" in columns or order == "popular"
+        # Huge tables are streamed, smaller ones are cached whole
+        if len(positions) > TABLE_CACHE_MAX_ROWS:
+            return self.streamed_response(request, variant, render, media_type="text/html", live_counts=live_counts)
+        return self.cached_response(request, variant, lambda: "".join(render()), media_type="text/html", live_counts=live_counts)
+
+    async def get_all_tags(self, request: Request, counts: bool = False):
+        await self.ensure_cache()
+
+        return self.cached_response(request, ("tags", counts), lambda: self.tags_payload(counts), live_counts=False)
+
+    def tags_payload(self, counts: bool):
+        # Tags are indexed with the catalog, most used first
+        tags = [{"tag": entry["tag"], "count": len(entry["plugins"])} for entry in self.cache["tags_index"].values()]
+        tags.sort(key=lambda tag: (-tag["count"], tag["tag"].lower()))
+
+        if not counts:
+            # The original shape, {index: tag}
+            return {i: tag["tag"] for i, tag in enumerate(tags)}
+        return {
+            "total_tags": len(tags),
+            "tags": tags,
+        }
 
-    async def get_plugins_by_tag(self, tag_name: str, page: int = 1, page_size: int = 0):
+    async def get_plugins_by_tag(self, request: Request, tag_name: str, page: int = 1, page_size: int = 0):
         if page_size == 0:
             page_size = self.page_size
 
-        # Check if cache is still valid, otherwise update the cache
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
-            await self.cache_plugins()
+        await self.ensure_cache()
 
-        # Find plugins containing the given tag
-        matching_plugins = []
-        for plugin_data in self.cache["plugins"]:
-            if "tags" in plugin_data and tag_name in plugin_data["tags"]:
-                matching_plugins.append(plugin_data)
+        return self.cached_response(request, ("tag", normalize_key(tag_name), page, page_size),
+                                    lambda: self.tag_page(tag_name, page, page_size))
 
-        total_plugins = len(matching_plugins)
+    def tag_page(self, tag_name: str, page: int, page_size: int):
+        # Find plugins having exactly the given tag, case and spacing don't matter
+        cache = self.cache
+        tag_entry = cache["tags_index"].get(normalize_key(tag_name))
+        positions = tag_entry["plugins"] if tag_entry else []
+
+        total_plugins = len(positions)
         start_index = (page - 1) * page_size
         end_index = start_index + page_size
 
@@ -174,7 +548,7 @@ class Endpoints:
             "total_plugins": total_plugins,
             "page": page,
             "page_size": page_size,
-            "plugins": matching_plugins[start_index:end_index],
+            "plugins": [cache["plugins"][position] for position in positions[start_index:end_index]],
         }
 
     @staticmethod
@@ -182,9 +556,7 @@ class Endpoints:
         return [plugin_data for plugin_data in plugins if plugin_data.get('name') not in excluded]
 
     async def exclude_plugins(self, page: int = 1, page_size: int = 10, excluded: List[str] = Body(..., embed=True)):
-        # Check if cache is still valid, otherwise update the cache
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
-            await self.cache_plugins()
+        await self.ensure_cache()
 
         plugins_to_exclude = set(excluded)
         filtered_plugins = self.filter_plugins_by_names(self.cache["plugins"], plugins_to_exclude)
@@ -207,17 +579,13 @@ class Endpoints:
         if page_size == 0:
             page_size = self.page_size
 
-        # Check if cache is still valid, otherwise update the cache
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
-            await self.cache_plugins()
+        await self.ensure_cache()
 
-        # Find plugins by the specified author name
-        matching_plugins = []
-        for plugin_data in self.cache["plugins"]:
-            if plugin_data.get("author_name") == author_name:
-                matching_plugins.append(plugin_data)
+        # Find plugins by the specified author name, case and spacing don't matter
+        cache = self.cache
+        positions = cache["authors_index"].get(normalize_key(author_name), [])
 
-        total_plugins = len(matching_plugins)
+        total_plugins = len(positions)
         start_index = (page - 1) * page_size
         end_index = start_index + page_size
 
@@ -228,213 +596,539 @@ class Endpoints:
             "total_plugins": total_plugins,
             "page": page,
             "page_size": page_size,
-            "plugins": matching_plugins[start_index:end_index],
+            "plugins": [cache["plugins"][position] for position in positions[start_index:end_index]],
         }
 
+    async def get_analytics(self) -> Dict[str, int]:
+        return self.downloads.totals
+
+    def with_plugin_names(self, rows: list) -> list:
+        cache = self.cache
+        for row in rows:
+            position = cache.get("positions_by_url", {}).get(row["url"])
+            row["name"] = cache["plugins"][position]["name"] if position is not None else None
+        return rows
+
     @staticmethod
-    async def get_analytics() -> Dict[str, int]:
-        analytics_data = read_analytics_data()
-        return analytics_data
+    def check_window(days: int, limit: int = 1):
+        if not 1 <= days <= MAX_ANALYTICS_DAYS:
+            raise HTTPException(status_code=400, detail=f"'days' must be between 1 and {MAX_ANALYTICS_DAYS}.")
+        if limit < 1:
+            raise HTTPException(status_code=400, detail="'limit' must be positive.")
 
-    async def get_analytics_plot(self) -> HTMLResponse:
-        # Check if cache is still valid, otherwise update the cache
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
-            await self.cache_plugins()
+    async def get_top_plugins(self, days: int = 30, limit: int = 10):
+        """
+        Most downloaded plugins in the last `days` days.
+        """
+        self.check_window(days, limit)
+        return {
+            "days": days,
+            "plugins": self.with_plugin_names(await self.downloads.top(days, limit)),
+        }
+
+    async def get_trending_plugins(self, days: int = 7, limit: int = 10):
+        """
+        Plugins whose downloads grew the most in the last `days` days compared to the `days` days before.
+        """
+        self.check_window(days, limit)
+        return {
+            "days": days,
+            "plugins": self.with_plugin_names(await self.downloads.trending(days, limit)),
+        }
+
+    async def get_plugin_downloads(self, url: str, days: int = 30):
+        """
+        Daily downloads of a plugin in the last `days` days.
+        """
+        self.check_window(days)
+        return {
+            "url": url,
+            "total_downloads": self.downloads.get(url),
+            "series": await self.downloads.series(url, days),
+        }
+
+    async def get_analytics_plot(self, request: Request) -> HTMLResponse:
+        # The chart is a separate, cacheable resource, linked with an absolute url so the fragment can be embedded anywhere
+        src = html.escape(str(request.url_for("get_analytics_plot_svg")))
+        return HTMLResponse(content=f'<img src="{src}" alt="Downloads by Plugin" />')
+
+    def plot_version(self) -> str:
+        """
+        Identifies the chart content: it changes with the download counts and the catalog's names.
+        """
+        return f"graph-{self.cache_timestamp['plugins'].isoformat()}-{self.downloads.version}"
+
+    async def get_analytics_plot_svg(self, request: Request):
+        await self.ensure_cache()
+
+        return self.responses.respond(request, self.plot_version(), ("graph", "svg"),
+                                      lambda: generate_plot_svg(plot_items(self.cache["plugins"], self.downloads.totals)),
+                                      media_type="image/svg+xml")
+
+    async def get_analytics_plot_png(self, request: Request):
+        await self.ensure_cache()
+
+        # Rasterizing is slow: render once per version of the counts, off the event loop
+        version = self.plot_version()
+        if self.plot_png[0] != version:
+            items = plot_items(self.cache["plugins"], self.downloads.totals)
+            png = await self.single_flight.run(("graph", version), asyncio.to_thread, generate_plot_png, items)
+            self.plot_png = (version, png)
 
-        html_img = generate_plot(self.cache["plugins"])
-        return HTMLResponse(content=html_img)
+        version, png = self.plot_png
+        return self.responses.respond(request, version, ("graph", "png"), lambda: png, media_type="image/png", compress=False)
 
     async def download_plugin_zip(self, plugin_data: dict = Body({"url": ""})):
-        # Check if cache is still valid, otherwise update the cache
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
-            await self.cache_plugins()
+        await self.ensure_cache()
 
         plugin_url = plugin_data.get("url")
-        if not plugin_url:
+        if not plugin_url or not isinstance(plugin_url, str):
             raise HTTPException(status_code=400, detail="Missing 'url' in request body.")
 
-        matching_plugins = [plugin for plugin in self.cache["plugins"] if plugin.get("url") == plugin_url]
+        cache = self.cache
+        position = cache["positions_by_url"].get(plugin_url)
 
-        if not matching_plugins:
+        if position is None:
             raise HTTPException(status_code=404, detail=f"Plugin url '{plugin_url}' not found.")
 
-        plugin_data = matching_plugins[0]
+        plugin_data = cache["plugins"][position]
         plugin_name = str(plugin_data.get("name"))
 
-        # Check if there is a release zip file
-        path_url = str(urlparse(plugin_url).path)
-        url = "https://api.github.com/repos" + path_url + "/releases"
-
-        async with AsyncClient() as client:
-
-            response = await client.get(url)
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=503,
-                    detail={"error": "Github API not available"}
-                )
-            response = response.json()
-            
-            i = 0
-            try:
-                # list of assets with files differents from Source code zips
-                assets = response[i]["assets"]
-                while len(assets) == 0:
-                    i += 1
-                    assets = response[i]["assets"]
-
-                url_zip = assets[0]["browser_download_url"]
-                version = response[i]["tag_name"]
-                if i != 0:
-                    error_log(f"The plugin {plugin_name} has no release zip file or was pushed by hand, the version pulled is {version}", "WARNING")
-
-                zip_filename = await self.download_releses_plugin_zip(plugin_name, url_zip, version)
-            except (IndexError, KeyError):
-                # if you are here, there aren't any assets in the response. So, download the zip repo
-                repo_path = await self.clone_repository(plugin_url, plugin_name)
-                zip_filename = await self.create_plugin_zip(repo_path, plugin_name)
+        # Check if there is a release zip file, release metadata is cached and revalidated
+        release = await self.releases.resolve(plugin_url)
 
         # Set the appropriate headers to trigger a download
         headers = {
             "Content-Disposition": f"attachment; filename={plugin_name}.zip"
         }
 
+        # Concurrent downloads of the same plugin share one job instead of racing on its files
+        if release:
+            url_zip = release["url_zip"]
+            version = release["version"]
+            if release["index"] != 0:
+                error_log(f"The plugin {plugin_name} has no release zip file or was pushed by hand, the version pulled is {version}", "WARNING")
+
+            zip_filename = await asyncio.to_thread(self.artifacts.lookup, plugin_url, version)
+            if not zip_filename:
+                if url_zip is None:
+                    raise HTTPException(status_code=503, detail={"error": "Github API not available"})
+                # Cache miss: stream the zip to the client while it is downloaded into the cache
+                download = self.release_download(plugin_url, url_zip, version)
+                await asyncio.shield(download.started)
+                if download.content_length:
+                    headers["Content-Length"] = download.content_length
+
+                self.record_download(plugin_url)
+                return StreamingResponse(download.stream(), headers=headers, media_type="application/zip")
+        else:
+            # if you are here, there aren't any assets in the releases. So, download the zip repo
+            zip_filename = await self.single_flight.run(("zip", plugin_url), self.build_repository_zip, plugin_url)
+
         # Update analytics count
-        update_analytics(plugin_url)
+        self.record_download(plugin_url)
 
         return FileResponse(zip_filename, headers=headers, media_type="application/zip")
 
+    async def download_plugins_bundle(self, plugins_data: dict = Body({"urls": []})):
+        await self.ensure_cache()
+
+        urls = plugins_data.get("urls")
+        if not urls or not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+            raise HTTPException(status_code=400, detail="Missing 'urls' list in request body.")
+        # Drop duplicates, keeping the requested order
+        urls = list(dict.fromkeys(urls))
+        if len(urls) > MAX_BUNDLE_PLUGINS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BUNDLE_PLUGINS} plugins can be downloaded at once.")
+
+        headers = {
+            "Content-Disposition": "attachment; filename=plugins.zip"
+        }
+        return StreamingResponse(self.bundle_stream(urls), headers=headers, media_type="application/zip")
+
+    async def bundle_stream(self, urls: list):
+        """
+        Yield a zip of the plugins' zips, each added as soon as it is ready, followed by
+        a `manifest.json` reporting the status of every requested plugin.
+        """
+        tasks = [asyncio.ensure_future(self.resolve_bundle_item(url)) for url in urls]
+        bundle = ZipStream()
+        manifest = []
+        try:
+            for next_item in asyncio.as_completed(tasks):
+                item, zip_filename = await next_item
+                if zip_filename is not None:
+                    item["file"] = bundle.unique_name(item["name"], ".zip")
+                    async for chunk in bundle.add_file(item["file"], zip_filename):
+                        yield chunk
+                    self.record_download(item["url"])
+                manifest.append(item)
+
+            # Report the plugins in the requested order
+            manifest.sort(key=lambda item: urls.index(item["url"]))
+            yield bundle.add_bytes("manifest.json", json.dumps({"plugins": manifest}, indent=2).encode("utf-8"))
+            yield bundle.close()
+        finally:
+            # The client went away: the downloads and builds go on for the cache, stop waiting for them
+            for task in tasks:
+                task.cancel()
+
+    async def resolve_bundle_item(self, plugin_url: str):
+        """
+        Resolve one plugin of a bundle to its cached zip.
+
+        Returns:
+            The status of the plugin, and the path of its zip or None if it failed.
+        """
+        item = {"url": plugin_url, "name": None, "status": "ok"}
+        try:
+            cache = self.cache
+            position = cache["positions_by_url"].get(plugin_url)
+            if position is None:
+                raise HTTPException(status_code=404, detail=f"Plugin url '{plugin_url}' not found.")
+            item["name"] = str(cache["plugins"][position].get("name"))
+
+            release = await self.releases.resolve(plugin_url)
+            if release:
+                item["version"] = release["version"]
+                zip_filename = await self.download_releses_plugin_zip(plugin_url, release["url_zip"], release["version"])
+            else:
+                zip_filename = await self.single_flight.run(("zip", plugin_url), self.build_repository_zip, plugin_url)
+            return item, zip_filename
+
+        except Exception as e:
+            if isinstance(e, HTTPException):
+                status_code, detail = e.status_code, e.detail
+            else:
+                status_code, detail = 500, str(e)
+                error_log(f"Can't bundle plugin {plugin_url}: {detail}", "ERROR")
+            item.update({"status": "error", "status_code": status_code, "error": detail})
+            return item, None
+
+    def record_download(self, plugin_url: str):
+        """
+        Count a download and show it in the catalog right away, without waiting for a refresh.
+        """
+        self.downloads.increment(plugin_url)
+        self.apply_downloads([plugin_url])
+
+    def apply_downloads(self, urls):
+        """
+        Show the current download counts of `urls` in the catalog and in the popular ordering.
+        """
+        cache = self.cache
+        positions_by_url = cache.get("positions_by_url", {})
+        for url in urls:
+            position = positions_by_url.get(url)
+            if position is not None:
+                cache["plugins"][position]["downloads"] = self.downloads.get(url)
+                cache["sort_orders"]["popular"].reposition(position)
+
+    async def run_blocking(self, function, *args):
+        """
+        Run blocking git and file work on the bounded worker pool, keeping the event loop free.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def build_repository_zip(self, plugin_url: str):
+        return await self.run_blocking(self.build_repository_zip_locked, plugin_url)
+
+    def build_repository_zip_locked(self, plugin_url: str):
+        # The zip of a commit never changes: when the remote head was already zipped, git has nothing to do
+        head = self.remote_head(plugin_url)
+        if head is None:
+            # GitHub unreachable: serve the last zip built, if any
+            version = self.artifacts.cached_version(plugin_url)
+            if version is None:
+                self.artifacts.count_lookup(False)
+            zip_filename = self.artifacts.lookup(plugin_url, version) if version else None
+            if zip_filename:
+                return zip_filename
+        else:
+            zip_filename = self.artifacts.lookup(plugin_url, head)
+            if zip_filename:
+                return zip_filename
+
+        # Worker processes share the repository cache, only one of them updates a repository at a time
+        with file_lock(self.artifacts.repo_lock_path(plugin_url)):
+            if head is not None:
+                # Another process may have built it while this one waited for the lock
+                zip_filename = self.artifacts.lookup(plugin_url, head, count=False)
+                if zip_filename:
+                    return zip_filename
+
+            with GIT_CLONE_DURATION.time():
+                commit = self.clone_repository(plugin_url, self.artifacts.repo_path(plugin_url))
+            self.artifacts.store_repo(plugin_url)
+
+            zip_filename = self.artifacts.lookup(plugin_url, commit, count=False)
+            if zip_filename:
+                return zip_filename
+
+            zip_filename = self.artifacts.zip_path(plugin_url, commit)
+            with ZIP_BUILD_DURATION.time():
+                sha256 = self.zip_builder.build(self.artifacts.repo_path(plugin_url), zip_filename)
+            self.artifacts.store_zip(plugin_url, commit, zip_filename, sha256)
+            return zip_filename
+
+    @staticmethod
+    def remote_head(plugin_url: str):
+        """
+        SHA of the head of the default branch of the remote repository, None if it can't be read.
+        """
+        import git
+
+        try:
+            output = git.cmd.Git().ls_remote(plugin_url, "HEAD")
+        except git.GitCommandError as e:
+            error_log(f"Can't read the head of {plugin_url}: {str(e)}", "WARNING")
+            return None
+        sha = output.split("\t", 1)[0].strip()
+        return sha or None
+
     @staticmethod
-    async def clone_repository(plugin_url: str, plugin_name: str):
-        # Define a cache directory
-        cache_dir = "repository_cache"
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
+    def clone_repository(plugin_url: str, repo_path: str) -> str:
+        """
+        Shallow clone the default branch of the repository in `repo_path`, or update the existing clone in place.
 
-        repo_path = os.path.join(cache_dir, plugin_name)
+        Returns:
+            The commit checked out.
+        """
+        # GitPython is heavy to import, only load it when a repository is actually cloned
+        import git
 
-        # Check if the repository is already cloned and updated
         if os.path.exists(repo_path):
             try:
+                # Fetch only the new head of the default branch and move the working tree to it
                 repo = git.Repo(repo_path)
-                origin = repo.remotes.origin
-                origin.fetch()
-
-                if "master" in origin.refs:
-                    origin_master = origin.refs["master"]
-                else:
-                    origin_master = origin.refs["main"]
-
-                diff = repo.git.diff(origin_master.commit, repo.head.commit)
-
-                if diff == "":
-                    return repo_path
-                else:
-                    shutil.rmtree(repo_path)
+                repo.git.fetch("--depth", "1", "origin", "HEAD")
+                repo.git.reset("--hard", "FETCH_HEAD")
+                repo.git.clean("-ffdx")
+                return repo.head.commit.hexsha
 
             except Exception as e:
-                message = f"Error while checking repository status: {str(e)}"
+                message = f"Error while updating repository: {str(e)}"
                 error_log(f"{repo_path} - {message}", "WARNING")
                 shutil.rmtree(repo_path)
 
         # Clone the repository
         try:
-            git.Repo.clone_from(plugin_url, repo_path)
+            repo = git.Repo.clone_from(plugin_url, repo_path, depth=1, single_branch=True)
         except git.GitCommandError as e:
             message = f"Failed to clone repository: {str(e)}"
             error_log(f"{repo_path} - {message}")
             raise HTTPException(status_code=500, detail=message)
 
-        return repo_path
+        return repo.head.commit.hexsha
 
-    @staticmethod
-    async def create_plugin_zip(repo_path: str, plugin_name: str):
-        zip_cache_dir = "zip_cache"
-        if not os.path.exists(zip_cache_dir):
-            os.makedirs(zip_cache_dir)
-
-        zip_filename = os.path.join(zip_cache_dir, f"{plugin_name}.zip")
-
-        # Create a .zip file excluding .git and __pycache__ folders
-        with zipfile.ZipFile(zip_filename, "w") as zip_file:
-            for root, _, files in os.walk(repo_path):
-                # Skip .git and __pycache__ folders
-                if ".git" in root or "__pycache__" in root:
-                    continue
+    def release_download(self, plugin_url: str, url_zip: str, version: str) -> TeeDownload:
+        """
+        The in-progress download of a release zip, started if needed. Concurrent requests attach to the same one.
+        """
+        key = (plugin_url, version)
+        download = self.release_downloads.get(key)
+        if download is None:
+            async def on_complete(path):
+                await self.run_blocking(self.artifacts.store_zip, plugin_url, version, path)
 
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zip_file.write(file_path, os.path.relpath(file_path, repo_path))
+            download = TeeDownload(self.asset_fetcher.get_client(), url_zip, self.artifacts.zip_path(plugin_url, version), on_complete)
+            self.release_downloads[key] = download
+            download.task.add_done_callback(lambda _: self.release_downloads.pop(key, None))
+        return download
 
-        return zip_filename
+    async def download_releses_plugin_zip(self, plugin_url: str, url_zip: str, version_origin: str):
+        os_path_plugin = await asyncio.to_thread(self.artifacts.lookup, plugin_url, version_origin)
 
-    @staticmethod
-    async def download_releses_plugin_zip(plugin_name: str, url_zip: str, version_origin: str):
-        # Define a cache directory
-        cache_dir = "zip_cache"
-        if not os.path.exists(cache_dir):
-            os.makedirs(cache_dir)
+        if os_path_plugin:
+            return os_path_plugin
+        if url_zip is None:
+            raise HTTPException(status_code=503, detail={"error": "Github API not available"})
+        return await self.release_download(plugin_url, url_zip, version_origin).wait()
 
-        name_plugin = plugin_name + ".zip"
-        os_path_plugin = os.path.join(cache_dir, name_plugin)
+    async def get_changes(self, since: Optional[int] = None, wait: float = 0):
+        """
+        Returns the catalog changes after revision `since`. With `wait`, waits up to that many seconds for a change if there is none yet.
+        """
+        await self.ensure_cache()
 
-        check = check_version_zip(plugin_name, version_origin)
+        cache = self.cache
+        if since is None:
+            since = cache["revision"]
+        changes = self.feed_changes(cache, since)
 
-        if os.path.exists(os_path_plugin) and check:
-            return os_path_plugin
-        else:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url_zip)
-
-                """
-                Check if there is a redirect, by looping the response
-                """
-                while response.is_redirect:
-                    try:
-                        url_location = response.headers["location"]
-                        response = await client.get(url_location)
-                    except httpx.RequestError as e:
-                        error = {"error": str(e)}
-                        raise HTTPException(
-                            status_code=400,
-                            detail=error
-                        )
-
-                if response.status_code != 200:
-                    error_message = f"GitHub API error: {response.text}"
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=error_message
-                    )
-
-                with open(os_path_plugin, "wb") as zip_ref:
-                    for chunk in response.iter_bytes(chunk_size=8192):
-                        zip_ref.write(chunk)
-                update_version_zip(plugin_name, version_origin)
+        if not changes and wait > 0:
+            try:
+                await asyncio.wait_for(self.revision_changed.wait(), min(wait, MAX_CHANGES_WAIT_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+            cache = self.cache
+            changes = self.feed_changes(cache, since)
 
-            return os_path_plugin
+        return {
+            "revision": cache["revision"],
+            "since": since,
+            "changes": changes,
+        }
 
-    async def search_plugins(self, search_data: dict):
-        # Check if cache is still valid, otherwise update the cache
-        if not is_cache_valid(self.cache_duration, self.cache_timestamp):
-            await self.cache_plugins()
+    @staticmethod
+    def feed_changes(cache: dict, since: int) -> list:
+        changes = changes_since(cache, since)
+        if changes is None:
+            raise HTTPException(
+                status_code=410,
+                detail=f"Revision {since} is not available, the change feed starts at revision {cache['changes_start']}. "
+                       f"Sync the full catalog from /plugins."
+            )
+        return changes
+
+    async def get_changes_stream(self, request: Request, since: Optional[int] = None):
+        """
+        Streams the catalog changes after revision `since` as server-sent events, then the following ones as they happen.
+        """
+        await self.ensure_cache()
+
+        # Reconnecting clients resume from the last revision they received
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id and last_event_id.isdigit():
+            since = int(last_event_id)
+        if since is None:
+            since = self.cache["revision"]
+        self.feed_changes(self.cache, since)
+
+        return StreamingResponse(self.changes_events(since), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    async def changes_events(self, since: int):
+        # Streams end after a while, so that they never hold up a server shutdown or restart
+        deadline = time.monotonic() + CHANGES_STREAM_SECONDS
+        yield "retry: 1000\n\n"
+        while True:
+            revision_changed = self.revision_changed
+            cache = self.cache
+            changes = changes_since(cache, since)
+            if changes is None:
+                yield f"event: reset\ndata: {json.dumps({'changes_start': cache['changes_start']})}\n\n"
+                return
+
+            for index, change in enumerate(changes):
+                # The id marks the last event of a revision: a client reconnecting from it missed nothing
+                last_of_revision = index + 1 == len(changes) or changes[index + 1]["revision"] != change["revision"]
+                event_id = f"id: {change['revision']}\n" if last_of_revision else ""
+                yield f"{event_id}event: {change['type']}\ndata: {json.dumps(change)}\n\n"
+            since = cache["revision"]
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # An id without data only sets where the client resumes from
+                yield f"id: {since}\n\n"
+                return
+            try:
+                await asyncio.wait_for(revision_changed.wait(), min(CHANGES_KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    async def search_plugins(self, request: Request, search_data: dict, page: Optional[int] = None, page_size: Optional[int] = None):
+        await self.ensure_cache()
 
         query = search_data.get("query")
         if not query:
             raise HTTPException(status_code=400, detail="Missing 'query' in request body.")
 
-        query_words = query.split()
+        # Without pagination parameters, all the matches are returned as a plain list like before
+        if page is None and page_size is None:
+            return self.cached_response(request, ("search", query), lambda: self.search_matches(query))
 
-        matching_plugins = []
-        for plugin_data in self.cache["plugins"]:
-            plugin_matches_all_words = all(
-                any( str(word).lower() in str(field).lower() for field in plugin_data.values())
-                for word in query_words
-            )
-            if plugin_matches_all_words:
-                matching_plugins.append(plugin_data)
+        page = page or 1
+        page_size = page_size or self.page_size
+        return self.cached_response(request, ("search", query, page, page_size),
+                                    lambda: self.search_page(query, page, page_size))
+
+    def search_matches(self, query: str) -> list:
+        # Resolve the query on the index built with the catalog, best matches first
+        cache = self.cache
+        return [cache["plugins"][position] for position in cache["search_index"].search(query)]
 
-        return matching_plugins
+    def search_page(self, query: str, page: int, page_size: int):
+        cache = self.cache
+        positions = cache["search_index"].search(query)
+
+        start_index = (page - 1) * page_size
+        end_index = start_index + page_size
+
+        return {
+            "total_plugins": len(positions),
+            "page": page,
+            "page_size": page_size,
+            "plugins": [cache["plugins"][position] for position in positions[start_index:end_index]],
+        }
+
+    async def startup(self, boot_time: float = None):
+        has_snapshot = self.load_snapshot()
+        if self.try_lead():
+            if has_snapshot:
+                # Serve the snapshot right away, revalidating it costs little thanks to the stored validators
+                self.schedule_refresh()
+        else:
+            self.follow_task = asyncio.create_task(self.follow_loop())
+        self.flush_task = asyncio.create_task(self.downloads.flush_loop(self.apply_downloads))
+        self.loop_monitor_task = asyncio.create_task(monitor_event_loop())
+        if REGISTRY.directory is not None:
+            self.metrics_task = asyncio.create_task(REGISTRY.publish_loop())
+
+        memory = process_memory()
+        self.startup_profile = {
+            "startup_seconds": round(time.perf_counter() - boot_time, 3) if boot_time is not None else None,
+            "rss_mb": memory["rss_mb"],
+            "heavy_modules_loaded": {module: module in sys.modules for module in HEAVY_MODULES},
+        }
+        error_log(f"Started in {self.startup_profile['startup_seconds']}s, RSS {memory['rss_mb']} MB", "INFO")
+
+    async def shutdown(self):
+        for task in (self.refresh_task, self.follow_task, self.flush_task, self.loop_monitor_task, self.metrics_task):
+            if task is not None:
+                task.cancel()
+        await self.downloads.flush()
+        self.analytics_store.close()
+        self.artifacts.save()
+        await self.fetcher.close()
+        await self.asset_fetcher.close()
+        if REGISTRY.directory is not None:
+            # The last counts of this worker, kept once it is gone
+            await asyncio.to_thread(REGISTRY.publish, REGISTRY.snapshot())
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.leader_lock is not None:
+            self.leader_lock.close()
+
+    async def get_startup_profile(self):
+        """
+        Returns the cold start cost of this process and its current memory usage.
+        """
+        return {
+            "startup": self.startup_profile,
+            "current": process_memory(),
+            "heavy_modules_loaded": {module: module in sys.modules for module in HEAVY_MODULES},
+        }
+
+    def collect_metrics(self):
+        CATALOG_PLUGINS.set(len(self.cache.get("plugins", [])))
+        if self.cache_timestamp:
+            CATALOG_AGE.set(round((datetime.utcnow() - self.cache_timestamp["plugins"]).total_seconds(), 3))
+        ARTIFACT_CACHE_BYTES.set(self.artifacts.total_bytes())
+
+    async def get_metrics(self):
+        """
+        Returns the metrics in the Prometheus text format.
+        """
+        # Values are copied on the event loop, the other workers' ones are read on a thread
+        snapshot = REGISTRY.snapshot()
+        content = await asyncio.to_thread(REGISTRY.render, snapshot)
+        return Response(content=content, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    async def get_cache_stats(self):
+        """
+        Returns the zip and repository cache statistics.
+        """
+        return self.artifacts.statistics()
 
     async def home(self):
         """
@@ -442,7 +1136,8 @@ class Endpoints:
         """
         out = {
             "status": "✅ Running: Fuck the American Dream! 🖕",
-            "version": self.app.openapi_schema["info"]["version"]
+            "version": self.app.openapi_schema["info"]["version"],
+            "last_refresh": self.refresh_stats,
         }
         return out
 
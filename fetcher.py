@@ -0,0 +1,158 @@
+import asyncio
+import random
+import time
+import httpx
+from logger import error_log
+from metrics import GITHUB_RESPONSES, GITHUB_RATE_LIMIT_REMAINING, PLUGIN_FETCH_DURATION
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Status codes worth retrying: GitHub answers 429/5xx when it is throttling or flaky
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class PluginFetcher:
+    """
+    Pooled HTTP client used to refresh the catalog.
+
+    All requests share one keep-alive (HTTP/2 when available) connection pool, the number
+    of requests in flight is bounded by `concurrency` and each fetch is retried with
+    exponential backoff. `pool_timeout` bounds the wait for a free connection of the pool
+    (`timeout` by default).
+    """
+
+    def __init__(self, concurrency: int = 16, timeout: float = 10.0, retries: int = 3, backoff: float = 0.5,
+                 pool_timeout: float = None):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.pool_timeout = pool_timeout or timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.client = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(self.timeout, pool=self.pool_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+            )
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def get(self, url: str, headers: dict = None) -> httpx.Response:
+        """
+        GET `url` through the shared pool, retrying on network errors and retryable status codes.
+        """
+        client = self.get_client()
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    response = await client.get(url, headers=headers)
+                GITHUB_RESPONSES.inc(response.status_code)
+                remaining = response.headers.get("x-ratelimit-remaining")
+                if remaining is not None and remaining.isdigit():
+                    GITHUB_RATE_LIMIT_REMAINING.set(int(remaining))
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    return response
+                reason = f"HTTP {response.status_code}"
+            except httpx.RequestError as e:
+                GITHUB_RESPONSES.inc("error")
+                if attempt >= self.retries:
+                    raise FetchError(f"{url}: {type(e).__name__} {str(e)}") from e
+                reason = f"{type(e).__name__} {str(e)}"
+
+            delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+            attempt += 1
+            error_log(f"Retrying {url} in {delay:.2f}s (attempt {attempt}/{self.retries}): {reason}", "WARNING")
+            await asyncio.sleep(delay)
+
+    async def fetch_json(self, url: str, previous: dict = None):
+        """
+        Conditionally GET a json document.
+
+        `previous` is the entry returned by an earlier call for the same url: its ETag and
+        Last-Modified validators are sent along and a 304 answer reuses it as is.
+
+        Returns:
+            A `(entry, changed)` tuple, where entry is a dict with the parsed `data` and its validators.
+        """
+        headers = {}
+        if previous:
+            if previous.get("etag"):
+                headers["If-None-Match"] = previous["etag"]
+            if previous.get("last_modified"):
+                headers["If-Modified-Since"] = previous["last_modified"]
+
+        response = await self.get(url, headers=headers)
+        if response.status_code == 304 and previous:
+            return previous, False
+        if response.status_code != 200:
+            raise FetchError(f"{url}: HTTP {response.status_code}", response.status_code)
+
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise FetchError(f"{url}: invalid json {str(e)}") from e
+
+        entry = {
+            "data": data,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+        }
+        return entry, True
+
+    async def timed_fetch_json(self, url: str, previous: dict = None):
+        start = time.perf_counter()
+        result = "failed"
+        try:
+            entry, changed = await self.fetch_json(url, previous)
+            result = "changed" if changed else "unchanged"
+            return entry, changed
+        finally:
+            PLUGIN_FETCH_DURATION.observe(time.perf_counter() - start, result)
+
+    async def fetch_all_json(self, urls: list, previous: dict = None):
+        """
+        Conditionally fetch every url concurrently.
+
+        Returns:
+            A `(results, stats)` tuple. `results` maps each url to the `(entry, changed)` tuple of
+            `fetch_json` or to the exception raised while fetching it, `stats` reports the duration
+            and the number of changed, unchanged and failed documents.
+        """
+        previous = previous or {}
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(self.timed_fetch_json(url, previous.get(url)) for url in urls), return_exceptions=True)
+        results = dict(zip(urls, responses))
+
+        failed = sum(1 for result in responses if isinstance(result, Exception))
+        changed = sum(1 for result in responses if not isinstance(result, Exception) and result[1])
+        stats = {
+            "duration_seconds": round(time.perf_counter() - start, 3),
+            "total": len(urls),
+            "changed": changed,
+            "unchanged": len(urls) - changed - failed,
+            "failed": failed,
+        }
+        return results, stats
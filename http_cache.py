@@ -0,0 +1,129 @@
+import gzip
+import json
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from metrics import CACHE_REQUESTS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+
+def accepted_encodings(request: Request) -> set:
+    encodings = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    # Weak comparison: W/"x" and "x" match
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+class ResponseCache:
+    """
+    Serialized and precompressed bodies of the catalog endpoints.
+
+    Bodies are keyed by catalog version and request variant (the normalized parameters), and
+    served with a version-based ETag: a matching If-None-Match gets a 304 without building
+    anything (a `max_age` under a second asks clients to always revalidate). Compressed encodings (gzip, and brotli when installed) are computed once per
+    body, the number of cached bodies is bounded with LRU eviction.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def respond(self, request: Request, version: str, variant, build, media_type: str = "application/json",
+                last_modified: datetime = None, max_age: int = 0, compress: bool = True) -> Response:
+        """
+        Answer `request` with the body returned by `build()`, serialized as json unless it is a string or bytes.
+        """
+        key = self.key(version, variant)
+        headers = self.headers(key, last_modified, max_age)
+        if etag_matches(request, headers["ETag"]):
+            CACHE_REQUESTS.inc("response", "not_modified")
+            return Response(status_code=304, headers=headers)
+
+        entry = self.entries.get(key)
+        if entry is None:
+            CACHE_REQUESTS.inc("response", "miss")
+            body = build()
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            elif not isinstance(body, bytes):
+                body = json.dumps(body, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+            entry = {"identity": body}
+            self.entries[key] = entry
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            CACHE_REQUESTS.inc("response", "hit")
+            self.entries.move_to_end(key)
+
+        encoding = self.choose_encoding(request, entry) if compress else "identity"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=entry[encoding], media_type=media_type, headers=headers)
+
+    def stream(self, request: Request, version: str, variant, chunks, media_type: str = "application/json",
+               last_modified: datetime = None, max_age: int = 0) -> Response:
+        """
+        Answer `request` with the body produced by `chunks()`, streamed uncompressed and not kept in memory
+        (for bodies too big to cache), with the same validators as `respond`.
+        """
+        headers = self.headers(self.key(version, variant), last_modified, max_age)
+        if etag_matches(request, headers["ETag"]):
+            CACHE_REQUESTS.inc("response", "not_modified")
+            return Response(status_code=304, headers=headers)
+
+        CACHE_REQUESTS.inc("response", "miss")
+        return StreamingResponse(chunks(), media_type=media_type, headers=headers)
+
+    @staticmethod
+    def key(version: str, variant) -> tuple:
+        return version, json.dumps(variant, sort_keys=True, default=str)
+
+    @staticmethod
+    def headers(key: tuple, last_modified: datetime = None, max_age: int = 0) -> dict:
+        headers = {
+            "ETag": 'W/"' + hashlib.sha1("|".join(key).encode()).hexdigest()[:24] + '"',
+            # Without a max-age, clients keep the body but revalidate it with its ETag before each use
+            "Cache-Control": f"public, max-age={int(max_age)}" if max_age >= 1 else "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+        return headers
+
+    @staticmethod
+    def choose_encoding(request: Request, entry: dict) -> str:
+        if len(entry["identity"]) < MIN_COMPRESS_SIZE:
+            return "identity"
+
+        encodings = accepted_encodings(request)
+        if brotli is not None and "br" in encodings:
+            if "br" not in entry:
+                entry["br"] = brotli.compress(entry["identity"], quality=6)
+            return "br"
+        if "gzip" in encodings:
+            if "gzip" not in entry:
+                entry["gzip"] = gzip.compress(entry["identity"], compresslevel=6, mtime=0)
+            return "gzip"
+        return "identity"
@@ -1,20 +1,64 @@
+import time
+BOOT_TIME = time.perf_counter()
+
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import uvicorn
 from endpoints import Endpoints
+from logger import error_log
+from zip_builder import parse_ignore
 
 GITHUB_PLUGINS_JSON_URL = os.getenv("GITHUB_PLUGINS_JSON_URL", "https://raw.githubusercontent.com/cheshire-cat-ai/plugins/main/plugins.json")
+GITHUB_RAW_URL = os.getenv("GITHUB_RAW_URL", "https://raw.githubusercontent.com")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
 DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 10))
 CACHE_DURATION_MINUTES = int(os.getenv("CACHE_DURATION_MINUTES", 1440))
-RELOAD = bool(os.getenv("RELOAD", True))
+MAX_STALE_MINUTES = int(os.getenv("MAX_STALE_MINUTES", 10080))
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "catalog_snapshot.json")
+ANALYTICS_DB_PATH = os.getenv("ANALYTICS_DB_PATH", "analytics.db")
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", 30))
+RELEASES_CACHE_MINUTES = float(os.getenv("RELEASES_CACHE_MINUTES", 10))
+CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", 2048))
+GIT_WORKERS = int(os.getenv("GIT_WORKERS", 4))
+RELOAD = os.getenv("RELOAD", "true").strip().lower() in ("1", "true", "yes", "on")
+ZIP_IGNORE = os.getenv("ZIP_IGNORE", ".git,__pycache__")
+ZIP_WORKERS = int(os.getenv("ZIP_WORKERS", 2))
+WORKERS = int(os.getenv("WORKERS", 1))
+GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", 10))
+if WORKERS > 1 and RELOAD:
+    # uvicorn ignores the workers when reloading
+    error_log(f"RELOAD is not supported with {WORKERS} workers, starting without reload", "WARNING")
+    RELOAD = False
+LEADER_LOCK_PATH = os.getenv("LEADER_LOCK_PATH", "leader.lock")
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", 16))
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", 10))
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", 3))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await backend.startup(boot_time=BOOT_TIME)
+    yield
+    await backend.shutdown()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-backend = Endpoints(app=app, plugin_json=GITHUB_PLUGINS_JSON_URL, page_size=DEFAULT_PAGE_SIZE, cache_duration=CACHE_DURATION_MINUTES)
+backend = Endpoints(app=app, plugin_json=GITHUB_PLUGINS_JSON_URL, page_size=DEFAULT_PAGE_SIZE, cache_duration=CACHE_DURATION_MINUTES,
+                    fetch_concurrency=FETCH_CONCURRENCY, fetch_timeout=FETCH_TIMEOUT_SECONDS, fetch_retries=FETCH_RETRIES,
+                    max_stale_duration=MAX_STALE_MINUTES, snapshot_path=CATALOG_SNAPSHOT_PATH,
+                    analytics_db_path=ANALYTICS_DB_PATH, analytics_flush_interval=ANALYTICS_FLUSH_SECONDS,
+                    git_workers=GIT_WORKERS, releases_cache_duration=RELEASES_CACHE_MINUTES,
+                    artifacts_max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                    github_raw_url=GITHUB_RAW_URL, github_api_url=GITHUB_API_URL, leader_lock_path=LEADER_LOCK_PATH, metrics_dir=METRICS_DIR,
+                    zip_ignore=parse_ignore(ZIP_IGNORE), zip_workers=ZIP_WORKERS)
 backend.customize_openapi("😸 Cheshire Cat AI - Plugins Registry", "https://cheshirecat.ai/wp-content/uploads/2023/10/Logo-Cheshire-Cat.svg", "1.0.1", "The Backend API to manage, filter, and download all the plugins in Cheshire Cat AI's official registry.")
 
 host = os.getenv("HOST", "0.0.0.0")
 port = int(os.getenv("PORT", 8000))
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host=host, port=port, reload=RELOAD)
+    uvicorn.run("main:app", host=host, port=port, reload=RELOAD, workers=WORKERS,
+                timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS)
@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import asyncio
+from bisect import bisect_left
+from utils import atomic_write_json, file_lock
+from logger import error_log
+
+# Buckets of the latency histograms, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Buckets of the slow operations: refreshes, clones and zip builds
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# How often the event loop lag is sampled
+LOOP_LAG_INTERVAL = 1.0
+# How often each worker publishes its metrics for the others to aggregate
+PUBLISH_INTERVAL = 5.0
+# File keeping the counters and histograms of the workers gone
+ARCHIVE_NAME = "archive.json"
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.values = {}
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def snapshot(self) -> list:
+        return [[list(labels), value] for labels, value in self.values.items()]
+
+    def merge(self, values: dict, snapshot: list, live: bool = True):
+        """
+        Add the series of a worker's `snapshot` to `values`.
+        """
+        for labels, value in snapshot:
+            labels = tuple(labels)
+            values[labels] = values.get(labels, 0) + value
+
+    def render(self, values: dict = None) -> list:
+        lines = self.header()
+        for label_values, value in sorted((self.values if values is None else values).items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, label_values)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        labels = tuple(map(str, labels))
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Across workers, the gauges of the live workers are combined with `aggregate` (max or min).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), aggregate=max):
+        super().__init__(name, documentation, labels)
+        self.aggregate = aggregate
+
+    def merge(self, values: dict, snapshot: list, live: bool = True):
+        if not live:
+            return
+        for labels, value in snapshot:
+            labels = tuple(labels)
+            values[labels] = self.aggregate(values[labels], value) if labels in values else value
+
+    def set(self, value: float, *labels):
+        labels = tuple(map(str, labels))
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    """
+    Cumulative histogram. Observing is a bisect and two additions, cheap enough for every request.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        # Label values are strings, a series is the same whether its labels were given as str or int
+        labels = tuple(map(str, labels))
+        series = self.values.get(labels)
+        if series is None:
+            # Per bucket counts (the last one is +Inf), then the sum
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labels):
+        return Timer(self, labels)
+
+    def snapshot(self) -> list:
+        return [[list(labels), list(series)] for labels, series in self.values.items()]
+
+    def merge(self, values: dict, snapshot: list, live: bool = True):
+        for labels, series in snapshot:
+            labels = tuple(labels)
+            if labels in values:
+                values[labels] = [total + value for total, value in zip(values[labels], series)]
+            else:
+                values[labels] = list(series)
+
+    def render(self, values: dict = None) -> list:
+        lines = self.header()
+        for label_values, series in sorted((self.values if values is None else values).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                bucket = format_labels(self.label_names, label_values, f'le="{format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Timer:
+    """
+    Context manager observing the time spent in its block.
+    """
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    """
+    The metrics of the process.
+
+    With a `directory` shared by the worker processes, each worker publishes its metrics there
+    (periodically and when it is scraped), and a scrape of any worker renders the metrics of
+    all of them: counters and histograms are summed, including the workers gone, gauges are
+    combined over the live workers.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self.directory = None
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        `collector()` is called before each scrape, to copy values kept elsewhere into gauges.
+        """
+        self.collectors.append(collector)
+
+    def share(self, directory: str):
+        """
+        Aggregate the metrics of the workers sharing `directory`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def snapshot(self) -> dict:
+        """
+        Copy of the current values, to be published or rendered off the event loop.
+        """
+        for collector in self.collectors:
+            collector()
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def render(self, snapshot: dict = None) -> str:
+        """
+        The metrics in the Prometheus text format. Blocking when the metrics are shared.
+        """
+        if snapshot is None:
+            snapshot = self.snapshot()
+        snapshots = self.publish(snapshot) if self.directory is not None else [(snapshot, True)]
+        values = self.aggregate(snapshots)
+
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render(values[metric.name])
+        return "\n".join(lines) + "\n"
+
+    def aggregate(self, snapshots: list) -> dict:
+        values = {metric.name: {} for metric in self.metrics}
+        for snapshot, live in snapshots:
+            for metric in self.metrics:
+                metric.merge(values[metric.name], snapshot.get(metric.name, []), live)
+        return values
+
+    def publish(self, snapshot: dict) -> list:
+        """
+        Write the `snapshot` of this worker, archive the metrics of the workers gone, and
+        return the snapshots of all the workers with whether they are alive. Blocking.
+        """
+        with file_lock(os.path.join(self.directory, ".lock")):
+            atomic_write_json(self.worker_path(os.getpid()), snapshot)
+
+            archive_path = os.path.join(self.directory, ARCHIVE_NAME)
+            archive = self.read(archive_path) or {}
+            snapshots = []
+            gone = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json") or name == ARCHIVE_NAME or not name[:-5].isdigit():
+                    continue
+                worker_snapshot = self.read(os.path.join(self.directory, name))
+                if worker_snapshot is None:
+                    continue
+                if process_alive(int(name[:-5])):
+                    snapshots.append((worker_snapshot, True))
+                else:
+                    gone.append((name, worker_snapshot))
+
+            if gone:
+                # Fold the workers gone into the archive, so that their counts never go away
+                values = self.aggregate([(archive, False)] + [(worker_snapshot, False) for _, worker_snapshot in gone])
+                archive = {metric.name: [[list(labels), value] for labels, value in values[metric.name].items()]
+                           for metric in self.metrics if not isinstance(metric, Gauge)}
+                atomic_write_json(archive_path, archive)
+                for name, _ in gone:
+                    os.remove(os.path.join(self.directory, name))
+
+        return snapshots + [(archive, False)]
+
+    def worker_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"{pid}.json")
+
+    @staticmethod
+    def read(path: str):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    async def publish_loop(self, interval: float = PUBLISH_INTERVAL):
+        """
+        Publish the metrics of this worker every `interval`, for the scrapes landing on the other workers.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            snapshot = self.snapshot()
+            try:
+                await asyncio.to_thread(self.publish, snapshot)
+            except OSError as e:
+                error_log(f"Can't publish the metrics to {self.directory}: {str(e)}", "WARNING")
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time spent answering requests, until the response headers are sent.",
+    ("method", "route", "status")))
+CATALOG_REFRESH_DURATION = REGISTRY.register(Histogram(
+    "catalog_refresh_duration_seconds", "Duration of the catalog refreshes.", ("result",), SLOW_BUCKETS))
+CATALOG_PLUGINS = REGISTRY.register(Gauge(
+    "catalog_plugins", "Plugins in the catalog being served."))
+CATALOG_AGE = REGISTRY.register(Gauge(
+    "catalog_age_seconds", "Time since the catalog being served was fetched.", aggregate=min))
+PLUGIN_FETCH_DURATION = REGISTRY.register(Histogram(
+    "plugin_fetch_duration_seconds", "Duration of each conditional fetch of a plugin manifest, retries included.", ("result",)))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "cache_requests_total", "Lookups in the catalog, zip, release and response caches.", ("cache", "result")))
+GITHUB_RESPONSES = REGISTRY.register(Counter(
+    "github_responses_total", "Responses received from GitHub, by status code.", ("status",)))
+GITHUB_RATE_LIMIT_REMAINING = REGISTRY.register(Gauge(
+    "github_rate_limit_remaining", "Remaining GitHub API requests, from the last response carrying the header.", aggregate=min))
+GIT_CLONE_DURATION = REGISTRY.register(Histogram(
+    "git_clone_duration_seconds", "Time spent cloning or updating a plugin repository.", (), SLOW_BUCKETS))
+ZIP_BUILD_DURATION = REGISTRY.register(Histogram(
+    "zip_build_duration_seconds", "Time spent zipping a plugin repository.", (), SLOW_BUCKETS))
+ARTIFACT_CACHE_BYTES = REGISTRY.register(Gauge(
+    "artifact_cache_bytes", "Disk used by the cached zips and repositories."))
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds", "Delay of the event loop in waking up a sleeping task."))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every request per route template, so /tag/{tag_name} is one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        responded = False
+
+        async def send_wrapper(message):
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                # Streamed bodies may take long, the latency is the time to the first byte
+                HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, scope["method"], route_name(scope), message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not responded:
+                HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, scope["method"], route_name(scope), 500)
+            raise
+
+
+def route_name(scope) -> str:
+    route = scope.get("route")
+    # Unknown paths share one series, they must not grow the label set
+    return getattr(route, "path", "unmatched")
+
+
+async def monitor_event_loop(interval: float = LOOP_LAG_INTERVAL):
+    """
+    Sleep `interval` over and over, measuring how late the loop wakes up.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(time.perf_counter() - start - interval, 0))
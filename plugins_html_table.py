@@ -1,4 +1,4 @@
-import pandas as pd
+from html import escape
 from fastapi import HTTPException
 
 PLUGIN_COLUMNS = [
@@ -14,12 +14,80 @@ PLUGIN_COLUMNS = [
     "downloads"
 ]
 
-def generate_plugins_html_table(plugins, columns: str = ",".join(PLUGIN_COLUMNS), render_link: bool = False, classes: str = "plugins-table"):
-    splitted_columns = columns.split(",")
+# Rows per chunk yielded by the streaming renderer
+ROWS_PER_CHUNK = 100
+
+
+def parse_columns(columns: str) -> tuple:
+    splitted_columns = [column.strip() for column in columns.split(",") if column.strip()]
     for column in splitted_columns:
         if column not in PLUGIN_COLUMNS:
             raise HTTPException(status_code=406, detail=f"'column' field: {column} not valid. Valid fields: {PLUGIN_COLUMNS}")
+    # Drop duplicates, keeping the requested order
+    return tuple(dict.fromkeys(splitted_columns))
+
+
+def normalize_classes(classes: str) -> str:
+    return " ".join(classes.split())
+
+
+def format_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in value)
+    return str(value)
+
+
+def render_cell(value: str, render_link: bool) -> str:
+    text = escape(value)
+    if render_link and value.startswith(("http://", "https://")):
+        return f'<a href="{text}" target="_blank">{text}</a>'
+    return text
+
+
+def prerender_cells(plugins: list) -> list:
+    """
+    Escape every cell of the catalog once, in both its plain and its link form.
+    Download counts change between refreshes, they are rendered on the fly.
+    """
+    cells = []
+    for plugin in plugins:
+        row = {}
+        for column in PLUGIN_COLUMNS:
+            if column == "downloads":
+                continue
+            value = format_value(plugin.get(column))
+            row[column] = (render_cell(value, False), render_cell(value, True))
+        cells.append(row)
+    return cells
+
+
+def render_plugins_html_table(plugins: list, cells: list, positions: list, columns: tuple, render_link: bool = False, classes: str = "plugins-table"):
+    """
+    Yield the html table of the plugins at `positions`, in chunks of rows.
+    """
+    link_index = 1 if render_link else 0
+    header = "".join(f"      <th>{column}</th>\n" for column in columns)
+    yield (
+        f'<table border="1" class="{escape(" ".join(["dataframe", classes]).strip())}">\n'
+        f'  <thead>\n    <tr style="text-align: right;">\n{header}    </tr>\n  </thead>\n  <tbody>\n'
+    )
+
+    chunk = []
+    for position in positions:
+        row = cells[position]
+        tds = []
+        for column in columns:
+            if column == "downloads":
+                tds.append(f"      <td>{int(plugins[position].get('downloads', 0))}</td>\n")
+            else:
+                tds.append(f"      <td>{row[column][link_index]}</td>\n")
+        chunk.append("    <tr>\n" + "".join(tds) + "    </tr>\n")
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+
+    chunk.append("  </tbody>\n</table>")
+    yield "".join(chunk)
 
-    df = pd.DataFrame(plugins)
-    df = df.filter(splitted_columns)
-    return df.to_html(index=False, render_links=render_link, classes=classes)
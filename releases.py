@@ -0,0 +1,119 @@
+import time
+from urllib.parse import urlparse
+from fastapi import HTTPException
+from logger import error_log
+from fetcher import PluginFetcher, FetchError
+from metrics import CACHE_REQUESTS
+from utils import SingleFlight
+
+
+def parse_release(releases: list):
+    """
+    Pick the most recent release having assets (files different from the Source code zips).
+
+    Returns:
+        A dict with the asset url, the release tag and its position in the list, or None if no release has assets.
+    """
+    i = 0
+    try:
+        assets = releases[i]["assets"]
+        while len(assets) == 0:
+            i += 1
+            assets = releases[i]["assets"]
+
+        return {
+            "url_zip": assets[0]["browser_download_url"],
+            "version": releases[i]["tag_name"],
+            "index": i,
+        }
+    except (IndexError, KeyError, TypeError):
+        return None
+
+
+class ReleaseCache:
+    """
+    GitHub releases metadata per repository.
+
+    Resolved releases are kept for `ttl` seconds, then revalidated with the stored ETag
+    (GitHub does not count 304 answers against the rate limit). When the API is unreachable
+    or rate-limited, the last known release keeps being served, or the version of the zip
+    already in the `artifacts` cache if this process never saw a release of the repository.
+    Concurrent lookups of the same repository share one request.
+    """
+
+    def __init__(self, fetcher: PluginFetcher, ttl: float = 600, api_url: str = "https://api.github.com", artifacts=None):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.api_url = api_url.rstrip("/")
+        self.artifacts = artifacts
+        self.entries = {}
+        self.single_flight = SingleFlight()
+
+    def releases_url(self, plugin_url: str) -> str:
+        return self.api_url + "/repos" + str(urlparse(plugin_url).path).rstrip("/") + "/releases"
+
+    async def resolve(self, plugin_url: str):
+        """
+        The release to download for `plugin_url`, or None if the repository has no release assets.
+
+        A release served from the zip cache while GitHub is unavailable has no `url_zip`.
+        """
+        url = self.releases_url(plugin_url)
+        entry = self.entries.get(url)
+        if entry and time.monotonic() - entry["checked_at"] < self.ttl:
+            CACHE_REQUESTS.inc("release", "hit")
+            return entry["release"]
+
+        return await self.single_flight.run(url, self.revalidate, plugin_url, url)
+
+    async def revalidate(self, plugin_url: str, url: str):
+        entry = self.entries.get(url)
+        headers = {"Accept": "application/vnd.github+json"}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+
+        try:
+            response = await self.fetcher.get(url, headers=headers)
+            status_code = response.status_code
+        except FetchError as e:
+            response = None
+            status_code = None
+            error_log(f"Github API not available for {url}: {str(e)}", "WARNING")
+
+        if status_code == 304 and entry:
+            CACHE_REQUESTS.inc("release", "revalidated")
+            entry["checked_at"] = time.monotonic()
+            return entry["release"]
+
+        if status_code == 200:
+            CACHE_REQUESTS.inc("release", "miss")
+            release = parse_release(response.json())
+            self.entries[url] = {
+                "release": release,
+                "etag": response.headers.get("etag"),
+                "checked_at": time.monotonic(),
+            }
+            return release
+
+        if entry:
+            CACHE_REQUESTS.inc("release", "stale")
+            # Serve the last known release, and don't ask again before the ttl expires
+            if response is not None:
+                error_log(f"Github API answered {status_code} for {url} (rate limit remaining: "
+                          f"{response.headers.get('x-ratelimit-remaining')}), serving the last known release", "WARNING")
+            entry["checked_at"] = time.monotonic()
+            return entry["release"]
+
+        # Restarted (or new worker) process: fall back on the zip already cached
+        version = self.artifacts.cached_version(plugin_url) if self.artifacts is not None else None
+        if version is not None:
+            CACHE_REQUESTS.inc("release", "stale")
+            error_log(f"Github API not available for {url}, serving the cached zip {version}", "WARNING")
+            release = {"url_zip": None, "version": version, "index": 0}
+            self.entries[url] = {"release": release, "etag": None, "checked_at": time.monotonic()}
+            return release
+
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Github API not available"}
+        )
@@ -0,0 +1,75 @@
+import re
+from bisect import bisect_left
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Hits in the name rank above hits in the tags, author and description
+FIELD_WEIGHTS = {
+    "name": 8,
+    "tags": 4,
+    "author_name": 2,
+    "description": 1,
+}
+
+# A token that only starts with the query word counts this much of an exact hit
+PREFIX_MATCH_RATIO = 0.5
+
+
+def tokenize(value) -> list:
+    if isinstance(value, list):
+        value = " ".join(str(item) for item in value)
+    return TOKEN_PATTERN.findall(str(value).lower())
+
+
+class SearchIndex:
+    """
+    Inverted index over the plugins' name, description, author_name and tags.
+
+    Built once per catalog refresh: every token maps to a posting list of
+    `{plugin position: score}`, and the sorted vocabulary allows prefix lookups.
+    """
+
+    def __init__(self, plugins: list):
+        self.postings = {}
+        for position, plugin in enumerate(plugins):
+            for field, weight in FIELD_WEIGHTS.items():
+                if field not in plugin or plugin[field] is None:
+                    continue
+                for token in tokenize(plugin[field]):
+                    posting = self.postings.setdefault(token, {})
+                    posting[position] = posting.get(position, 0) + weight
+        self.vocabulary = sorted(self.postings)
+
+    def lookup(self, word: str) -> dict:
+        """
+        Scores of the plugins containing a token equal to, or starting with, `word`.
+        """
+        scores = dict(self.postings.get(word, {}))
+        # Tokens starting with `word` are contiguous in the sorted vocabulary, walk them in place
+        for index in range(bisect_left(self.vocabulary, word), len(self.vocabulary)):
+            token = self.vocabulary[index]
+            if not token.startswith(word):
+                break
+            if token == word:
+                continue
+            for position, score in self.postings[token].items():
+                scores[position] = max(scores.get(position, 0), score * PREFIX_MATCH_RATIO)
+        return scores
+
+    def search(self, query: str) -> list:
+        """
+        Positions of the plugins matching every word of `query`, best matches first.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+
+        # Intersect starting from the shortest posting list
+        matches = sorted((self.lookup(word) for word in set(words)), key=len)
+        results = dict(matches[0])
+        for scores in matches[1:]:
+            results = {position: score + scores[position] for position, score in results.items() if position in scores}
+            if not results:
+                return []
+
+        return sorted(results, key=lambda position: (-results[position], position))
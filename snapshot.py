@@ -0,0 +1,73 @@
+import os
+import json
+from datetime import datetime
+from logger import error_log
+from utils import atomic_write_json
+
+# Bump when the snapshot layout changes, older snapshots are then ignored
+SNAPSHOT_VERSION = 1
+
+
+def save_catalog_snapshot(path: str, cache: dict, cache_timestamp: datetime):
+    """
+    Persist the validated catalog, its manifests and their validators, and the change feed.
+    """
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "timestamp": cache_timestamp.isoformat(),
+        "index": cache["index"],
+        "manifests": cache["manifests"],
+        "plugins": cache["plugins"],
+        "revision": cache["revision"],
+        "changes_start": cache["changes_start"],
+        "changes": cache["changes"],
+    }
+    atomic_write_json(path, snapshot, separators=(",", ":"))
+
+
+def load_catalog_snapshot(path: str):
+    """
+    Load a snapshot written by `save_catalog_snapshot`.
+
+    Returns:
+        A `(cache, cache_timestamp)` tuple, or None if there is no usable snapshot.
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "r") as snapshot_file:
+            snapshot = json.load(snapshot_file)
+
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            error_log(f"Ignoring catalog snapshot {path}: incompatible version", "WARNING")
+            return None
+
+        cache_timestamp = datetime.fromisoformat(snapshot["timestamp"])
+        plugins = snapshot["plugins"]
+        if not isinstance(plugins, list) or not isinstance(snapshot["manifests"], dict) or not isinstance(snapshot["index"], dict):
+            raise ValueError("malformed catalog")
+        for plugin in plugins:
+            if not plugin.get("name") or not plugin.get("author_name") or not plugin.get("url"):
+                raise ValueError(f"invalid plugin entry {plugin}")
+
+        # Snapshots written before the change feed start it at their catalog
+        revision = int(snapshot.get("revision", 1))
+        changes = snapshot.get("changes", [])
+        changes_start = int(snapshot.get("changes_start", revision))
+        if not isinstance(changes, list):
+            raise ValueError("malformed change feed")
+
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        error_log(f"Ignoring corrupt catalog snapshot {path}: {str(e)}", "WARNING")
+        return None
+
+    cache = {
+        "plugins": plugins,
+        "index": snapshot["index"],
+        "manifests": snapshot["manifests"],
+        "revision": revision,
+        "changes_start": changes_start,
+        "changes": changes,
+    }
+    return cache, cache_timestamp
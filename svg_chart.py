@@ -0,0 +1,73 @@
+from html import escape
+
+FONT = "Open Sans, Arial, sans-serif"
+BAR_COLOR = "cornflowerblue"
+BAR_HEIGHT = 22
+MARGIN_TOP = 60
+MARGIN_BOTTOM = 60
+MARGIN_RIGHT = 40
+CHAR_WIDTH = 7
+TICKS = 5
+
+
+def nice_step(maximum: float, ticks: int = TICKS) -> int:
+    """
+    A round tick step (1, 2 or 5 times a power of ten) covering `maximum` in about `ticks` steps.
+    """
+    raw = max(maximum / ticks, 1)
+    magnitude = 10 ** (len(str(int(raw))) - 1)
+    for multiplier in (1, 2, 5, 10):
+        if multiplier * magnitude >= raw:
+            return multiplier * magnitude
+    return 10 * magnitude
+
+
+def render_bar_chart(items: list, title: str = "Downloads by Plugin", x_title: str = "Number of Downloads",
+                     y_title: str = "Plugin", width: int = 1024, min_height: int = 600) -> str:
+    """
+    Render `(label, value)` pairs as a horizontal bar chart, largest value on top, in plain SVG.
+    """
+    items = sorted(items, key=lambda item: item[1], reverse=True)
+    label_width = min(max((len(str(label)) for label, _ in items), default=0) * CHAR_WIDTH + 20, width // 3)
+    margin_left = label_width + 40
+    plot_width = width - margin_left - MARGIN_RIGHT
+    height = max(min_height, MARGIN_TOP + MARGIN_BOTTOM + BAR_HEIGHT * len(items))
+    plot_height = height - MARGIN_TOP - MARGIN_BOTTOM
+    row_height = plot_height / max(len(items), 1)
+
+    step = nice_step(max((value for _, value in items), default=0))
+    axis_max = step * max(-(-max((value for _, value in items), default=0) // step), 1)
+
+    def x(value):
+        return margin_left + plot_width * value / axis_max
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+        f'font-family="{FONT}" font-size="12">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<text x="{width / 2}" y="30" text-anchor="middle" font-size="18" font-weight="bold">{escape(title)}</text>',
+    ]
+
+    # Vertical grid lines and x axis labels
+    for tick in range(0, int(axis_max) + 1, step):
+        parts.append(f'<line x1="{x(tick):.1f}" y1="{MARGIN_TOP}" x2="{x(tick):.1f}" y2="{MARGIN_TOP + plot_height}" stroke="grey" stroke-width="0.5"/>')
+        parts.append(f'<text x="{x(tick):.1f}" y="{MARGIN_TOP + plot_height + 18}" text-anchor="middle">{tick}</text>')
+
+    for row, (label, value) in enumerate(items):
+        y = MARGIN_TOP + row * row_height
+        bar_height = row_height * 0.8
+        label = str(label)
+        shown_label = label if len(label) * CHAR_WIDTH <= label_width else label[:label_width // CHAR_WIDTH - 1] + "…"
+        parts.append(
+            f'<rect x="{margin_left}" y="{y + row_height * 0.1:.1f}" width="{x(value) - margin_left:.1f}" height="{bar_height:.1f}" '
+            f'fill="{BAR_COLOR}" fill-opacity="0.9" stroke="black" stroke-width="1"><title>{escape(label)}: {value}</title></rect>'
+        )
+        parts.append(f'<text x="{margin_left - 8}" y="{y + row_height / 2 + 4:.1f}" text-anchor="end">{escape(shown_label)}</text>')
+
+    parts += [
+        f'<text x="{margin_left + plot_width / 2}" y="{height - 15}" text-anchor="middle" font-size="14" font-weight="bold">{escape(x_title)}</text>',
+        f'<text x="20" y="{MARGIN_TOP + plot_height / 2}" text-anchor="middle" font-size="14" font-weight="bold" '
+        f'transform="rotate(-90 20 {MARGIN_TOP + plot_height / 2})">{escape(y_title)}</text>',
+        '</svg>',
+    ]
+    return "\n".join(parts)
@@ -0,0 +1,111 @@
+import os
+import asyncio
+import httpx
+from fastapi import HTTPException
+from logger import error_log
+
+
+class TeeDownload:
+    """
+    One upstream download, written to a temporary file while any number of clients stream it.
+
+    The download runs in its own task, so it completes (and fills the cache) even if the
+    client that started it goes away. Clients attach at any time: they read the temporary
+    file up to what has been written so far and wait for more. On success the file is
+    atomically renamed to `path` and `on_complete(path)` is awaited; on failure it is deleted.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, url: str, path: str, on_complete=None):
+        self.client = client
+        self.url = url
+        self.path = path
+        # Worker processes downloading the same zip don't share their temporary file
+        self.tmp_path = f"{path}.{os.getpid()}.part"
+        self.on_complete = on_complete
+        self.content_length = None
+        self.written = 0
+        self.done = False
+        self.error = None
+        self.condition = asyncio.Condition()
+        self.started = asyncio.get_running_loop().create_future()
+        self.finished = asyncio.get_running_loop().create_future()
+        self.task = asyncio.create_task(self.run())
+
+    async def notify(self):
+        async with self.condition:
+            self.condition.notify_all()
+
+    async def run(self):
+        try:
+            async with self.client.stream("GET", self.url, follow_redirects=True) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise HTTPException(status_code=response.status_code, detail=f"GitHub API error: {response.text}")
+
+                self.content_length = response.headers.get("content-length")
+                with open(self.tmp_path, "wb") as tmp_file:
+                    self.started.set_result(True)
+                    # Forward chunks as they arrive, a chunk_size would buffer them
+                    async for chunk in response.aiter_bytes():
+                        tmp_file.write(chunk)
+                        tmp_file.flush()
+                        self.written += len(chunk)
+                        await self.notify()
+
+            # Readers that already opened the temporary file keep reading it after the rename
+            os.replace(self.tmp_path, self.path)
+            self.done = True
+            if self.on_complete is not None:
+                try:
+                    await self.on_complete(self.path)
+                except Exception as e:
+                    # The file is complete anyway, don't fail the clients reading it
+                    error_log(f"Can't record the download of {self.url}: {str(e)}", "ERROR")
+            self.finished.set_result(self.path)
+
+        except Exception as e:
+            if isinstance(e, httpx.RequestError):
+                e = HTTPException(status_code=400, detail={"error": str(e)})
+            elif not isinstance(e, HTTPException):
+                error_log(f"Download of {self.url} failed: {str(e)}", "ERROR")
+                e = HTTPException(status_code=502, detail={"error": f"Download failed: {str(e)}"})
+            self.error = e
+            for future in (self.started, self.finished):
+                if not future.done():
+                    future.set_exception(e)
+                    # Mark the exception as retrieved, nobody may be waiting for this one
+                    future.exception()
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+        finally:
+            await self.notify()
+
+    async def wait(self) -> str:
+        """
+        Wait for the download to complete and return the cached file path.
+        """
+        return await asyncio.shield(self.finished)
+
+    async def stream(self):
+        """
+        Yield the file content as it is downloaded.
+        """
+        await asyncio.shield(self.started)
+
+        # Open the final file if the download already completed, the temporary one otherwise
+        with open(self.path if self.done else self.tmp_path, "rb") as file:
+            offset = 0
+            while True:
+                async with self.condition:
+                    await self.condition.wait_for(lambda: self.written > offset or self.done or self.error is not None)
+
+                if self.error is not None:
+                    raise self.error
+
+                chunk = file.read(self.written - offset)
+                if chunk:
+                    offset += len(chunk)
+                    yield chunk
+                elif self.done:
+                    break
@@ -1,7 +1,13 @@
 from datetime import datetime, timedelta
 import os
-import httpx
+import asyncio
 import json
+import hashlib
+import base64
+import fcntl
+import tempfile
+import resource
+from contextlib import contextmanager
 
 
 def is_cache_valid(cache_duration: int, cache_timestamp: dict):
@@ -14,71 +20,125 @@ def is_cache_valid(cache_duration: int, cache_timestamp: dict):
     return datetime.utcnow() < cache_time + timedelta(minutes=cache_duration)
 
 
-async def fetch_plugin_json(url):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        return response.json()
-
-
-def update_version_zip(name_plugin: str, version: str):
-    cache_path = "zip_cache/versions.json"
-
-    # Load existing versions from the JSON file
-    if os.path.exists(cache_path):
-        with open(cache_path, "r") as json_file:
-            versions = json.load(json_file)
-    else:
-        versions = []
-        
-    # Search for the plugin by name_plugin
-    plugin_found = False
-    for index, matching_plugins in enumerate(versions):
-        if matching_plugins["name_plugin"] == name_plugin:
-            plugin_found = not plugin_found
-            data = versions[index]
-            data["version"] = version
-    # If plugin not found, add it
-    if not plugin_found:
-        versions.append({"name_plugin": name_plugin, "version": version})
-    
-    # Save the updated list of versions to a variable
-    updated_versions = versions
-    
-    # Write the updated list back to the JSON file
-    with open(cache_path, "w") as json_file:
-        json.dump(updated_versions, json_file, indent=4)
-
-
-def check_version_zip(name_plugin: str, version: str) -> bool:
-    """
-    Check if the cached plugin is updated.
-    
+def atomic_write_json(path: str, data, **dump_kwargs):
+    """
+    Write `data` as json to a temporary file next to `path`, then rename it over `path`.
+    Readers see either the old or the new file, never a partial one.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as tmp_file:
+            json.dump(data, tmp_file, **dump_kwargs)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive lock shared by all the processes (and threads) locking the same `path`. Blocking.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def try_lock(path: str):
+    """
+    Take the lock on `path` without waiting.
+
     Returns:
-        False if is not updated or not exist otherwise return True
-    """
-    # Define a cache directory
-    cache_json = "zip_cache/" + "versions.json"
-    if not os.path.exists(cache_json):
-        with open(cache_json, "w") as json_file:
-            data = []
-            json.dump(data, json_file)
-            return False
-    else:
-        with open(cache_json, "r") as json_file:
-            versions: list[dict] = json.load(json_file) 
-            matching_plugins = [plugin for plugin in versions if plugin.get("name_plugin") == name_plugin]
-            if matching_plugins:
-                cache_version = matching_plugins[0]["version"]
-                if cache_version == version:
-                    return True
-            
-            return False
-
-
-def read_analytics_data():
-    file_path = 'analytics.json'
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            return json.load(file)
-    else:
-        return {}
+        The open lock file, to keep open as long as the lock is held, or None if another process holds it.
+    """
+    lock_file = open(path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path: str):
+    """
+    Changes whenever the file at `path` is rewritten or replaced, None if it does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent work: callers asking for a key that is already in progress
+    await the same task instead of starting a new one.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+
+    def running(self, key) -> bool:
+        return key in self.tasks
+
+    async def run(self, key, function, *args):
+        task = self.tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function(*args))
+            self.tasks[key] = task
+            task.add_done_callback(lambda done: self.tasks.pop(key, None) if self.tasks.get(key) is done else None)
+
+        # Shield the shared task: a cancelled caller must not cancel the work for the others
+        return await asyncio.shield(task)
+
+
+def process_memory() -> dict:
+    """
+    Current and peak resident memory of this process, in MB.
+    """
+    max_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    rss_mb = max_rss_mb
+    try:
+        with open("/proc/self/statm") as statm:
+            rss_mb = round(int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2, 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    return {"rss_mb": rss_mb, "max_rss_mb": max_rss_mb}
+
+
+def encode_cursor(data: dict) -> str:
+    """
+    Opaque pagination cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(data, dict):
+        raise ValueError("Invalid cursor")
+    return data
@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import stat
+import shutil
+import zipfile
+import threading
+import subprocess
+from fnmatch import fnmatch
+from utils import file_sha256
+
+# Files and directories left out of the plugin zips, matched on their name or their path in the repository
+DEFAULT_IGNORE = (".git", "__pycache__")
+# Repositories with more content than this are zipped in a worker process
+PROCESS_MIN_BYTES = 16 * 1024 * 1024
+# Timestamp of every entry (the earliest a zip can store), so that a commit always gives the same bytes
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def parse_ignore(patterns: str) -> tuple:
+    return tuple(pattern.strip().strip("/") for pattern in patterns.split(",") if pattern.strip())
+
+
+def is_ignored(name: str, relative_path: str, ignore: tuple) -> bool:
+    return any(fnmatch(name, pattern) or fnmatch(relative_path, pattern) for pattern in ignore)
+
+
+def collect_files(repo_path: str, ignore: tuple = DEFAULT_IGNORE):
+    """
+    Files to zip, as sorted posix paths relative to `repo_path`, and their total size.
+
+    Ignored directories are pruned from the walk, never descended into. Symbolic links
+    pointing outside the repository are skipped.
+    """
+    root_path = os.path.realpath(repo_path)
+    files = []
+    total_size = 0
+    for root, dirs, names in os.walk(repo_path):
+        relative_root = os.path.relpath(root, repo_path)
+        relative_root = "" if relative_root == "." else relative_root.replace(os.sep, "/") + "/"
+        dirs[:] = [directory for directory in dirs if not is_ignored(directory, relative_root + directory, ignore)]
+
+        for name in names:
+            relative_path = relative_root + name
+            if is_ignored(name, relative_path, ignore):
+                continue
+            path = os.path.join(root, name)
+            real_path = os.path.realpath(path)
+            if os.path.commonpath([root_path, real_path]) != root_path or not os.path.isfile(real_path):
+                continue
+            files.append(relative_path)
+            total_size += os.path.getsize(real_path)
+
+    files.sort()
+    return files, total_size
+
+
+def write_zip(repo_path: str, files: list, zip_filename: str) -> str:
+    """
+    Zip `files` of `repo_path` into `zip_filename`, reproducibly: sorted entries, fixed timestamps
+    and permissions. The zip is written next to its final path and renamed over it.
+
+    Returns:
+        The sha256 of the zip, which identifies its content.
+    """
+    tmp_filename = f"{zip_filename}.{os.getpid()}.part"
+    try:
+        with zipfile.ZipFile(tmp_filename, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zip_file:
+            for relative_path in files:
+                path = os.path.join(repo_path, relative_path)
+                info = zipfile.ZipInfo(relative_path, date_time=ZIP_DATE_TIME)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.create_system = 3
+                executable = os.stat(path).st_mode & stat.S_IXUSR
+                info.external_attr = (stat.S_IFREG | (0o755 if executable else 0o644)) << 16
+                info.file_size = os.path.getsize(path)
+                with open(path, "rb") as source, zip_file.open(info, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+
+        os.replace(tmp_filename, zip_filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise
+    return file_sha256(zip_filename)
+
+
+class ZipBuilder:
+    """
+    Builds the zips of the plugin repositories.
+
+    Small repositories are zipped in the calling thread. Large ones are zipped in separate
+    processes, at most `workers` at a time, so that several big builds compress in parallel
+    without holding the GIL of the server.
+    """
+
+    def __init__(self, ignore: tuple = DEFAULT_IGNORE, workers: int = 2, process_min_bytes: int = PROCESS_MIN_BYTES):
+        self.ignore = tuple(ignore)
+        self.workers = workers
+        self.process_min_bytes = process_min_bytes
+        self.slots = threading.BoundedSemaphore(max(workers, 1))
+
+    def build(self, repo_path: str, zip_filename: str) -> str:
+        """
+        Zip the repository in `repo_path` to `zip_filename`. Blocking.
+
+        Returns:
+            The sha256 of the zip.
+        """
+        files, total_size = collect_files(repo_path, self.ignore)
+        if self.workers > 0 and total_size >= self.process_min_bytes:
+            with self.slots:
+                return self.build_in_process(repo_path, files, zip_filename)
+        return write_zip(repo_path, files, zip_filename)
+
+    @staticmethod
+    def build_in_process(repo_path: str, files: list, zip_filename: str) -> str:
+        # A fresh interpreter running this module, not a fork of the threaded server
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), repo_path, zip_filename],
+                                input=json.dumps(files), capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Zip build of {repo_path} failed: {result.stderr.strip()}")
+        return result.stdout.strip()
+
+
+if __name__ == "__main__":
+    # Worker process: the files to zip are read from stdin, the sha256 of the zip is written to stdout
+    print(write_zip(sys.argv[1], json.load(sys.stdin), sys.argv[2]))
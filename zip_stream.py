@@ -0,0 +1,80 @@
+import io
+import re
+import asyncio
+import zipfile
+
+# Bytes read from disk at a time
+CHUNK_SIZE = 1024 * 1024
+
+
+class StreamBuffer(io.RawIOBase):
+    """
+    Write-only, unseekable file collecting what zipfile writes until it is taken.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ZipStream:
+    """
+    A zip archive produced in chunks, to be sent while it is written.
+
+    Entries are stored without compression: they are zips already. The output is not seekable,
+    so sizes and checksums follow each entry in a data descriptor.
+    """
+
+    def __init__(self):
+        self.buffer = StreamBuffer()
+        self.zip_file = zipfile.ZipFile(self.buffer, "w", zipfile.ZIP_STORED)
+        self.names = set()
+
+    def unique_name(self, name: str, extension: str = "") -> str:
+        """
+        A safe entry name based on `name`, different from the ones already used.
+        """
+        base = re.sub(r"[^\w.-]+", "_", name).strip("._") or "plugin"
+        candidate = base + extension
+        number = 2
+        while candidate in self.names:
+            candidate = f"{base}-{number}{extension}"
+            number += 1
+        self.names.add(candidate)
+        return candidate
+
+    async def add_file(self, name: str, path: str):
+        """
+        Add the file at `path` as `name`, yielding the archive bytes as they are produced.
+        """
+        with open(path, "rb") as source, self.zip_file.open(name, "w") as target:
+            while True:
+                chunk = await asyncio.to_thread(source.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+                yield self.buffer.take()
+        yield self.buffer.take()
+
+    def add_bytes(self, name: str, data: bytes) -> bytes:
+        self.zip_file.writestr(name, data)
+        return self.buffer.take()
+
+    def close(self) -> bytes:
+        """
+        Write the central directory, returns the last bytes of the archive.
+        """
+        self.zip_file.close()
+        return self.buffer.take()